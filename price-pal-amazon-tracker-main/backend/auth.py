@@ -3,11 +3,11 @@ from fastapi import Body
 from fastapi import APIRouter, HTTPException, status, Depends, Body
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from models import UserCreate, UserLogin, User, PasswordReset, PasswordResetConfirm
-from firebase_config import firebase_service
+from firebase_config import run_blocking
+from token_cache import token_cache, verify_id_token
 from email_service import send_welcome_email, send_otp_email
 import secrets
 from datetime import datetime, timedelta
-from firebase_admin import auth as firebase_auth
 
 # Ensure router is defined before any route decorators
 router = APIRouter()
@@ -51,7 +51,11 @@ async def send_login_email(email: str = Body(...), name: str = Body("")):
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         id_token = credentials.credentials
-        decoded_token = firebase_auth.verify_id_token(id_token)
+        decoded_token = token_cache.get(id_token)
+        if decoded_token is None:
+            # Verification can fetch Google's signing keys, so keep it off the loop
+            decoded_token = await run_blocking(verify_id_token, id_token)
+            token_cache.set(id_token, decoded_token)
         uid = decoded_token["uid"]
         email = decoded_token.get("email")
         name = decoded_token.get("name", "")
@@ -0,0 +1,44 @@
+from extractor import extract_fast, extract_soup
+from pathlib import Path
+import timeit
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# Real product pages are several hundred KB, mostly scripts and widgets
+# around the few elements we need; pad the fixtures to match
+PADDING_BLOCK = (
+    b'<div class="a-section a-spacing-small"><span class="a-list-item">'
+    b'Customers who viewed this item also viewed</span>'
+    b'<script type="text/javascript">P.when("A").execute(function(A){});</script></div>\n'
+)
+
+def padded(content: bytes, target_size: int = 400_000) -> bytes:
+    """Insert filler markup around the page body to reach target_size bytes"""
+    repeats = max(0, (target_size - len(content)) // len(PADDING_BLOCK))
+    before = PADDING_BLOCK * (repeats // 4)
+    after = PADDING_BLOCK * (repeats - repeats // 4)
+    body_start = content.index(b'<body')
+    body_end = content.rindex(b'</body>')
+    return content[:body_start] + before + content[body_start:body_end] + after + content[body_end:]
+
+def bench(name: str, content: bytes, number: int = 20):
+    fast = extract_fast(content)
+    soup = extract_soup(content)
+    if fast is None:
+        print(f"{name}: fast path missed, falls back to soup")
+    elif fast != soup:
+        print(f"{name}: MISMATCH\n  fast: {fast}\n  soup: {soup}")
+
+    fast_time = timeit.timeit(lambda: extract_fast(content), number=number) / number
+    soup_time = timeit.timeit(lambda: extract_soup(content), number=number) / number
+    print(
+        f"{name:<32} {len(content) / 1024:>7.1f} KB  "
+        f"fast {fast_time * 1000:>8.3f} ms  soup {soup_time * 1000:>8.3f} ms  "
+        f"speedup {soup_time / fast_time:>6.1f}x"
+    )
+
+if __name__ == "__main__":
+    for fixture in sorted(FIXTURES_DIR.glob("*.html")):
+        content = fixture.read_bytes()
+        bench(fixture.name, content)
+        bench(f"{fixture.name} (padded)", padded(content))
@@ -0,0 +1,48 @@
+from email_templates import PRICE_ALERT_HTML, WEEKLY_REMINDER_HTML
+import random
+import time
+
+RECIPIENTS = 100_000
+
+# The weekly reminder body as the old f-string helper built it, per call
+_WEEKLY_SOURCE = WEEKLY_REMINDER_HTML.source
+_ALERT_SOURCE = PRICE_ALERT_HTML.source
+
+def fstring_style(source: str, values: dict) -> str:
+    """Stand-in for the old helpers: parse and build the whole document per call"""
+    return source.format(**values)
+
+def recipients(count: int):
+    first_names = ["Asha", "Ravi", "Meera", "Arjun", "Priya", "Kabir", "Neha", "Vikram"]
+    for i in range(count):
+        yield {
+            "user_name": f"{random.choice(first_names)} {i % 997}",
+            "product_name": f"Wireless Earbuds Model {i % 50}",
+            "current_price": 1299.0 + i % 300,
+            "target_price": 1500.0,
+            "lowest_price": 1199.0,
+            "image_url": f"https://m.media-amazon.com/images/I/{i % 50}.jpg",
+            "amazon_url": f"https://www.amazon.in/dp/B0ABCD{i % 50:04d}"
+        }
+
+def timed(label: str, fn, rows: list):
+    started = time.perf_counter()
+    results = fn(rows)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed:>7.3f} s  {len(rows) / elapsed:>12,.0f} renders/sec")
+    return results
+
+if __name__ == "__main__":
+    random.seed(0)
+    rows = list(recipients(RECIPIENTS))
+    print(f"Rendering for {RECIPIENTS:,} recipients")
+
+    old = timed("weekly reminder, format per call", lambda r: [fstring_style(_WEEKLY_SOURCE, v) for v in r], rows)
+    new = timed("weekly reminder, compiled render", lambda r: [WEEKLY_REMINDER_HTML.render(v) for v in r], rows)
+    many = timed("weekly reminder, render_many", WEEKLY_REMINDER_HTML.render_many, rows)
+    assert old == new == many
+
+    old = timed("price alert, format per call", lambda r: [fstring_style(_ALERT_SOURCE, v) for v in r], rows)
+    new = timed("price alert, compiled render", lambda r: [PRICE_ALERT_HTML.render(v) for v in r], rows)
+    many = timed("price alert, render_many", PRICE_ALERT_HTML.render_many, rows)
+    assert old == new == many
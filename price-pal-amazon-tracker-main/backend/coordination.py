@@ -0,0 +1,247 @@
+from firebase_admin import firestore
+from firebase_config import firebase_service, get_db, run_blocking
+from google.cloud.firestore_v1.field_path import FieldPath
+from typing import Dict, Set, Tuple
+import hashlib
+import math
+import os
+import socket
+import time
+import uuid
+
+# Coordination configuration. Lease expiry uses wall-clock time, so the TTL
+# must stay well above the clock skew between replicas.
+COORDINATION_BACKEND = os.getenv("COORDINATION_BACKEND", "firestore")
+LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", "60"))
+SWEEP_SHARDS = int(os.getenv("SWEEP_SHARDS", "16"))
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+LEASES_COLLECTION = "leases"
+# One-off job claims live apart from the leases heartbeats scan
+CLAIMS_COLLECTION = "job_claims"
+WORKER_LEASE_PREFIX = "worker:"
+SHARD_LEASE_PREFIX = "shard:"
+LEADER_LEASE = "leader"
+
+def shard_of(key: str, shards: int = SWEEP_SHARDS) -> int:
+    """Stable shard for a key (the product's ASIN), the same on every replica"""
+    digest = hashlib.md5(key.encode()).digest()
+    return int.from_bytes(digest[:4], "big") % shards
+
+class LocalLeaseStore:
+    """In-process stand-in for the Firestore lease collection"""
+
+    def __init__(self):
+        self._leases: Dict[str, Tuple[str, float]] = {}
+
+    def try_acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        current = self._leases.get(name)
+        if current is not None and current[0] != owner and current[1] > now:
+            return False
+        self._leases[name] = (owner, now + ttl)
+        return True
+
+    def release(self, name: str, owner: str):
+        current = self._leases.get(name)
+        if current is not None and current[0] == owner:
+            del self._leases[name]
+
+    def live_leases(self, prefix: str) -> Dict[str, str]:
+        now = time.time()
+        leases = {}
+        for name, (owner, expires_at) in list(self._leases.items()):
+            if not name.startswith(prefix):
+                continue
+            if expires_at > now:
+                leases[name] = owner
+            else:
+                del self._leases[name]
+        return leases
+
+class FirestoreLeaseStore:
+    """Leases stored as documents, claimed and renewed in transactions"""
+
+    def __init__(self, collection: str = LEASES_COLLECTION):
+        self.collection = collection
+
+    def try_acquire(self, name: str, owner: str, ttl: float) -> bool:
+        doc_ref = firebase_service.get_collection(self.collection).document(name)
+
+        @firestore.transactional
+        def claim(transaction) -> bool:
+            snapshot = doc_ref.get(transaction=transaction)
+            now = time.time()
+            if snapshot.exists:
+                lease = snapshot.to_dict() or {}
+                if lease.get("owner") != owner and lease.get("expires_at", 0) > now:
+                    return False
+            transaction.set(doc_ref, {"owner": owner, "expires_at": now + ttl})
+            return True
+
+        return claim(firebase_service.transaction())
+
+    def release(self, name: str, owner: str):
+        doc_ref = firebase_service.get_collection(self.collection).document(name)
+
+        @firestore.transactional
+        def drop(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if snapshot.exists and (snapshot.to_dict() or {}).get("owner") == owner:
+                transaction.delete(doc_ref)
+
+        drop(firebase_service.transaction())
+
+    def live_leases(self, prefix: str) -> Dict[str, str]:
+        """Unexpired leases whose names start with prefix.
+
+        Only the prefix's key range is read, and expired leases found there
+        (e.g. from replicas that crashed) are deleted so the range stays small.
+        """
+        now = time.time()
+        leases = {}
+        query = (
+            firebase_service.get_collection(self.collection)
+            .order_by(FieldPath.document_id())
+            .start_at({FieldPath.document_id(): prefix})
+            .end_before({FieldPath.document_id(): prefix + "\uf8ff"})
+        )
+        for doc in query.stream():
+            lease = doc.to_dict() or {}
+            if lease.get("expires_at", 0) > now:
+                leases[doc.id] = lease.get("owner")
+                continue
+            try:
+                # Only if nobody renewed it since we read it
+                doc.reference.delete(option=get_db().write_option(last_update_time=doc.update_time))
+            except Exception:
+                pass
+        return leases
+
+class SweepCoordinator:
+    """Leader election and shard ownership for the background jobs.
+
+    Every replica heartbeats a worker lease, works out its fair share of
+    the sweep shards from the number of live workers and holds that many
+    shard leases. Shards of a worker that stops renewing expire and are
+    picked up by the survivors on their next heartbeat. Whoever holds the
+    leader lease runs the singleton jobs, such as the weekly reminders.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        claims=None,
+        worker_id: str = WORKER_ID,
+        shards: int = SWEEP_SHARDS,
+        ttl: float = LEASE_TTL_SECONDS
+    ):
+        if store is None:
+            store = LocalLeaseStore() if COORDINATION_BACKEND == "local" else FirestoreLeaseStore()
+        if claims is None:
+            claims = (
+                LocalLeaseStore() if COORDINATION_BACKEND == "local"
+                else FirestoreLeaseStore(CLAIMS_COLLECTION)
+            )
+        self.store = store
+        self.claims = claims
+        self.worker_id = worker_id
+        self.shards = shards
+        self.ttl = ttl
+        self.owned: Set[int] = set()
+        self.leader = False
+        self.live_workers = 0
+        # Bumped whenever the owned shard set changes
+        self.generation = 0
+        self._valid_until = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        return self.leader and time.time() < self._valid_until
+
+    def owned_shards(self) -> Set[int]:
+        # If heartbeats stopped, our leases may already belong to someone else
+        if time.time() >= self._valid_until:
+            return set()
+        return self.owned
+
+    def owns(self, key: str) -> bool:
+        return shard_of(key, self.shards) in self.owned_shards()
+
+    async def heartbeat(self):
+        """Renew leases, rebalance shards and refresh leadership"""
+        await run_blocking(self._heartbeat)
+
+    def _heartbeat(self):
+        started = time.time()
+        store = self.store
+        store.try_acquire(f"{WORKER_LEASE_PREFIX}{self.worker_id}", self.worker_id, self.ttl)
+
+        self.live_workers = max(1, len(store.live_leases(WORKER_LEASE_PREFIX)))
+        fair_share = math.ceil(self.shards / self.live_workers)
+
+        # Hand back anything beyond our fair share, dropping it from owned
+        # first so no new checks start on a shard that is being released
+        kept = set(sorted(self.owned)[:fair_share])
+        surplus = self.owned - kept
+        if surplus:
+            self._set_owned(kept)
+            for shard in surplus:
+                store.release(f"{SHARD_LEASE_PREFIX}{shard}", self.worker_id)
+
+        # Renew the rest, forgetting any that were taken over meanwhile
+        owned = {
+            shard for shard in kept
+            if store.try_acquire(f"{SHARD_LEASE_PREFIX}{shard}", self.worker_id, self.ttl)
+        }
+        self._set_owned(owned)
+
+        # Claim free or expired shards, starting at a worker-specific offset
+        # so replicas don't all race for the same ones
+        offset = shard_of(self.worker_id, self.shards)
+        for i in range(self.shards):
+            if len(owned) >= fair_share:
+                break
+            shard = (offset + i) % self.shards
+            if shard not in owned and store.try_acquire(
+                f"{SHARD_LEASE_PREFIX}{shard}", self.worker_id, self.ttl
+            ):
+                owned.add(shard)
+
+        self._set_owned(owned)
+        self.leader = store.try_acquire(LEADER_LEASE, self.worker_id, self.ttl)
+        self._valid_until = started + self.ttl
+
+    def _set_owned(self, owned: Set[int]):
+        if owned != self.owned:
+            self.generation += 1
+            self.owned = set(owned)
+
+    async def claim_once(self, name: str, ttl: float) -> bool:
+        """Claim a one-off job (e.g. this week's reminders) for ttl seconds"""
+        # A fresh owner per attempt, so this replica can't re-claim it either
+        owner = f"{self.worker_id}:{uuid.uuid4().hex}"
+        return await run_blocking(self.claims.try_acquire, name, owner, ttl)
+
+    async def release_all(self):
+        """Hand back every lease on shutdown so others take over at once"""
+        def release():
+            for shard in self.owned:
+                self.store.release(f"{SHARD_LEASE_PREFIX}{shard}", self.worker_id)
+            self.store.release(LEADER_LEASE, self.worker_id)
+            self.store.release(f"{WORKER_LEASE_PREFIX}{self.worker_id}", self.worker_id)
+
+        await run_blocking(release)
+        self.owned = set()
+        self.leader = False
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "leader": self.is_leader,
+            "live_workers": self.live_workers,
+            "owned_shards": sorted(self.owned_shards()),
+            "shards": self.shards
+        }
+
+coordinator = SweepCoordinator()
@@ -1,9 +1,11 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from auth import get_current_user
-from firebase_config import firebase_service
+from firebase_config import async_firebase_service
 from models import UserUpdate
+from price_checker import price_checker
 from typing import List
+from user_cache import user_cache
 
 router = APIRouter()
 
@@ -25,7 +27,9 @@ async def update_user_profile(
     """Update user profile"""
     try:
         # Get user document
-        users = firebase_service.query_documents("users", "uid", "==", current_user["uid"])
+        users = await async_firebase_service.query_documents(
+            "users", "uid", "==", current_user["uid"]
+        )
         if not users:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -39,7 +43,8 @@ async def update_user_profile(
             update_data["email"] = user_data.email
         
         # Update in Firestore
-        firebase_service.update_document("users", user_doc["id"], update_data)
+        await async_firebase_service.update_document("users", user_doc["id"], update_data)
+        user_cache.invalidate(current_user["uid"])
         
         return {"message": "Profile updated successfully"}
         
@@ -49,7 +54,9 @@ async def update_user_profile(
 @router.get("/user/cart")
 async def get_user_cart(current_user: dict = Depends(get_current_user)):
     try:
-        products = firebase_service.query_documents("products", "user_id", "==", current_user["uid"])
+        products = await async_firebase_service.query_documents(
+            "products", "user_id", "==", current_user["uid"]
+        )
         return {
             "products": products,
             "total_products": len(products),
@@ -66,7 +73,9 @@ async def remove_from_cart(
     """Remove product from cart"""
     try:
         # Get product
-        product = firebase_service.get_document("products", product_id)
+        product = await async_firebase_service.get_document(
+            "products", product_id, fields=["user_id"]
+        )
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
@@ -75,7 +84,8 @@ async def remove_from_cart(
             raise HTTPException(status_code=403, detail="Not authorized")
         
         # Delete product
-        firebase_service.delete_document("products", product_id)
+        await async_firebase_service.delete_document("products", product_id)
+        price_checker.schedule.remove(product_id)
         
         return {"message": "Product removed from cart"}
         
@@ -86,7 +96,10 @@ async def remove_from_cart(
 async def get_user_stats(current_user: dict = Depends(get_current_user)):
     """Get user statistics"""
     try:
-        products = firebase_service.query_documents("products", "user_id", "==", current_user["uid"])
+        products = await async_firebase_service.query_documents(
+            "products", "user_id", "==", current_user["uid"],
+            fields=["is_active", "lowest_price", "target_price"]
+        )
         
         active_products = [p for p in products if p.get("is_active", True)]
         total_savings = sum(
@@ -0,0 +1,274 @@
+from rate_limiter import backoff_delay
+from typing import Awaitable, Callable, Iterable, List, Optional, Sequence, Set
+import aiosmtplib
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+
+# Email outbox configuration; ":memory:" keeps the outbox in-process only
+EMAIL_OUTBOX_PATH = os.getenv("EMAIL_OUTBOX_PATH", "email_outbox.db")
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "3"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE_DELAY = float(os.getenv("EMAIL_RETRY_BASE_DELAY", "30"))
+EMAIL_RETRY_MAX_DELAY = float(os.getenv("EMAIL_RETRY_MAX_DELAY", "3600"))
+# How often idle workers look for retries that have come due
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "5"))
+# A message claimed longer ago than this is assumed abandoned by a process
+# that died mid-send, and goes back in the queue
+EMAIL_CLAIM_TIMEOUT = float(os.getenv("EMAIL_CLAIM_TIMEOUT", "600"))
+# Sent mail is kept this long so its dedup key keeps blocking repeats
+EMAIL_OUTBOX_RETENTION_DAYS = float(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "30"))
+
+# Rejections that retrying cannot fix go straight to the dead letters
+PERMANENT_ERRORS = (
+    aiosmtplib.SMTPRecipientsRefused,
+    aiosmtplib.SMTPRecipientRefused,
+    aiosmtplib.SMTPSenderRefused,
+    aiosmtplib.SMTPAuthenticationError
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedup_key TEXT UNIQUE,
+    to_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    claimed_by TEXT,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+-- Dedup keys of the messages a combined message (e.g. a digest) stands in for
+CREATE TABLE IF NOT EXISTS outbox_keys (
+    dedup_key TEXT PRIMARY KEY,
+    message_id INTEGER NOT NULL
+);
+"""
+
+class EmailOutbox:
+    """Durable queue of outgoing mail drained by background delivery workers.
+
+    enqueue() is a single local SQLite insert, so request handlers and
+    sweeps never wait on SMTP. Workers retry failed sends with backoff and
+    move a message to the dead letters (status 'dead') once it has used up
+    its attempts or was rejected outright.
+
+    Several processes may share the outbox file, so each claim records its
+    owner: a process only requeues its own in-flight messages when it stops,
+    and other processes' claims only once they are older than
+    EMAIL_CLAIM_TIMEOUT.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[str, str, str], Awaitable[None]],
+        path: str = EMAIL_OUTBOX_PATH,
+        workers: int = EMAIL_WORKERS,
+        max_attempts: int = EMAIL_MAX_ATTEMPTS
+    ):
+        self.deliver = deliver
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._db: Optional[sqlite3.Connection] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_prune = 0.0
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.counters = {"enqueued": 0, "duplicates": 0, "sent": 0, "retried": 0, "dead": 0}
+
+    def _get_db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            if self.path != ":memory:":
+                # WAL with relaxed syncing keeps enqueue to a fraction of a millisecond
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(outbox)")}
+            for column, kind in (("claimed_by", "TEXT"), ("claimed_at", "REAL")):
+                if column not in columns:
+                    # Outbox files created before claims had owners
+                    self._db.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+        return self._db
+
+    def enqueue(
+        self,
+        to_email: str,
+        subject: str,
+        html: str,
+        dedup_key: Optional[str] = None,
+        covers: Sequence[str] = ()
+    ) -> bool:
+        """Queue a message; False if one with the same dedup key was already queued.
+
+        covers lists the dedup keys of other messages this one replaces.
+        They block those messages later, and if any of them was already
+        used the message is treated as a duplicate.
+        """
+        now = time.time()
+        db = self._get_db()
+        keys = ([dedup_key] if dedup_key else []) + list(covers)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            duplicate = bool(keys) and bool(self._used_keys(keys))
+            if not duplicate:
+                cursor = db.execute(
+                    "INSERT INTO outbox (dedup_key, to_email, subject, html, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (dedup_key, to_email, subject, html, now, now)
+                )
+                db.executemany(
+                    "INSERT OR IGNORE INTO outbox_keys (dedup_key, message_id) VALUES (?, ?)",
+                    [(key, cursor.lastrowid) for key in covers]
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if duplicate:
+            self.counters["duplicates"] += 1
+            return False
+        self.counters["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _used_keys(self, keys: List[str]) -> Set[str]:
+        placeholders = ", ".join("?" * len(keys))
+        rows = self._get_db().execute(
+            f"SELECT dedup_key FROM outbox WHERE dedup_key IN ({placeholders}) "
+            f"UNION SELECT dedup_key FROM outbox_keys WHERE dedup_key IN ({placeholders})",
+            keys + keys
+        ).fetchall()
+        return {row["dedup_key"] for row in rows}
+
+    def used_keys(self, keys: Iterable[str]) -> Set[str]:
+        """The given dedup keys that a queued or sent message already holds"""
+        keys = list(dict.fromkeys(keys))
+        return self._used_keys(keys) if keys else set()
+
+    def start(self):
+        """Start the delivery workers on the running event loop"""
+        self._requeue_stale()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Return what we cancelled mid-send to the queue; other processes'
+        # claims are theirs to finish
+        self._get_db().execute(
+            "UPDATE outbox SET status = 'pending', claimed_by = NULL "
+            "WHERE status = 'sending' AND claimed_by = ?",
+            (self.owner,)
+        )
+
+    def _requeue_stale(self):
+        """Requeue messages whose sender has held them past the claim timeout"""
+        self._get_db().execute(
+            "UPDATE outbox SET status = 'pending', claimed_by = NULL "
+            "WHERE status = 'sending' AND (claimed_at IS NULL OR claimed_at < ?)",
+            (time.time() - EMAIL_CLAIM_TIMEOUT,)
+        )
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        return self._get_db().execute(
+            "UPDATE outbox SET status = 'sending', claimed_by = ?, claimed_at = ? WHERE id = ("
+            "  SELECT id FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?"
+            "  ORDER BY next_attempt_at LIMIT 1"
+            ") RETURNING id, to_email, subject, html, attempts",
+            (self.owner, now, now)
+        ).fetchone()
+
+    async def _worker(self):
+        while True:
+            message = self._claim()
+            if message is None:
+                self._prune()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), EMAIL_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self.deliver(message["to_email"], message["subject"], message["html"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed(message, e)
+                continue
+
+            self._get_db().execute(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, "
+                "last_error = NULL WHERE id = ?",
+                (time.time(), message["id"])
+            )
+            self.counters["sent"] += 1
+
+    def _failed(self, message: sqlite3.Row, error: Exception):
+        attempts = message["attempts"] + 1
+        if attempts >= self.max_attempts or isinstance(error, PERMANENT_ERRORS):
+            print(f"Giving up on email to {message['to_email']} after {attempts} attempts: {error}")
+            status, next_attempt_at = "dead", time.time()
+            self.counters["dead"] += 1
+        else:
+            status = "pending"
+            next_attempt_at = time.time() + backoff_delay(
+                attempts - 1, EMAIL_RETRY_BASE_DELAY, EMAIL_RETRY_MAX_DELAY
+            )
+            self.counters["retried"] += 1
+        self._get_db().execute(
+            "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? "
+            "WHERE id = ?",
+            (status, attempts, next_attempt_at, str(error), message["id"])
+        )
+
+    def _prune(self):
+        now = time.time()
+        if now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        # Catches messages left behind by a process that died and never restarted
+        self._requeue_stale()
+        cutoff = now - EMAIL_OUTBOX_RETENTION_DAYS * 86400
+        self._get_db().execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (cutoff,)
+        )
+        self._get_db().execute(
+            "DELETE FROM outbox_keys WHERE message_id NOT IN (SELECT id FROM outbox)"
+        )
+
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        rows = self._get_db().execute(
+            "SELECT id, dedup_key, to_email, subject, attempts, last_error, created_at "
+            "FROM outbox WHERE status = 'dead' ORDER BY id DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> dict:
+        rows = self._get_db().execute(
+            "SELECT status, COUNT(*) AS count FROM outbox GROUP BY status"
+        ).fetchall()
+        return {**self.counters, "queue": {row["status"]: row["count"] for row in rows}}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
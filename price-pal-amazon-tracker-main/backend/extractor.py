@@ -0,0 +1,303 @@
+from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, NamedTuple, Optional
+import asyncio
+import html
+import multiprocessing
+import os
+import re
+
+# Extraction engine: "fast" scans for the needed fields and falls back to
+# BeautifulSoup when it misses one, "soup" always builds the full tree
+SCRAPER_EXTRACTOR = os.getenv("SCRAPER_EXTRACTOR", "fast")
+# Worker processes for BeautifulSoup parses; 0 parses inline on the event loop.
+# The fast path always runs inline, since shipping a page to a worker costs
+# about as much as scanning it. With several uvicorn workers (WEB_CONCURRENCY)
+# each would start its own pool, so the default there is none.
+_WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+PARSE_POOL_SIZE = int(os.getenv(
+    "PARSE_POOL_SIZE", "0" if _WEB_WORKERS > 1 else str(min(2, os.cpu_count() or 1))
+))
+
+class ProductFields(NamedTuple):
+    product_name: str
+    current_price: float
+    image_url: str
+    availability: str
+
+PRICE_PATTERN = re.compile(r'[\d,]+\.?\d*')
+
+# One alternation over every marker the fast path cares about, so the page is
+# scanned once by the regex engine instead of once per selector
+_FIELD_MARKERS = re.compile(
+    rb'id="(?P<id>productTitle|landingImage|availability)"'
+    rb'|class="(?P<cls>(?:[^"]*\s)?a-(?:price-whole|offscreen)(?:\s[^"]*)?)"'
+)
+_SRC_ATTR = re.compile(rb'\s(?:src|data-src)="([^"]*)"')
+_SPAN_TEXT = re.compile(rb'<span\b[^>]*>(.*?)</span>', re.S)
+_TAGS = re.compile(r'<[^>]+>')
+
+# How far past the #availability container to look for its first span
+_AVAILABILITY_WINDOW = 2048
+
+def parse_price(price_text: str) -> Optional[float]:
+    """Extract the numeric value from a price string such as '₹1,299.00'"""
+    price_match = PRICE_PATTERN.search(price_text.strip().replace(',', ''))
+    if price_match:
+        return float(price_match.group())
+    return None
+
+def _decode(raw: bytes) -> str:
+    return html.unescape(raw.decode('utf-8', errors='replace'))
+
+# Bytes kept from the end of the buffer between chunks so a marker split
+# across two chunks is still matched
+_MARKER_OVERLAP = 256
+
+class FastScanner:
+    """Incremental form of the fast-path scan.
+
+    Page bytes can be fed in chunks as they arrive; feed() reports when every
+    field has been captured so a streaming download can stop early.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.product_name = None
+        self.price_whole = None
+        self.price_offscreen = None
+        self.image_url = None
+        self.availability = None
+        self._pos = 0
+
+    @property
+    def complete(self) -> bool:
+        # Everything the soup path would prefer has been captured
+        return None not in (self.product_name, self.price_whole, self.image_url, self.availability)
+
+    def feed(self, chunk: bytes) -> bool:
+        """Scan a new chunk of the page; returns True once all fields are found"""
+        self.buffer += chunk
+        self._scan(final=False)
+        return self.complete
+
+    def finish(self) -> Optional[ProductFields]:
+        """Scan whatever is left in the buffer and return the fields, if found"""
+        self._scan(final=True)
+        return self.result()
+
+    def result(self) -> Optional[ProductFields]:
+        current_price = None
+        if self.price_whole is not None:
+            current_price = parse_price(self.price_whole)
+        if current_price is None and self.price_offscreen is not None:
+            current_price = parse_price(self.price_offscreen)
+
+        if not self.product_name or current_price is None or not self.image_url:
+            return None
+
+        return ProductFields(
+            product_name=self.product_name,
+            current_price=current_price,
+            image_url=self.image_url,
+            availability=self.availability or "In Stock"
+        )
+
+    def _scan(self, final: bool):
+        content = self.buffer
+        for match in _FIELD_MARKERS.finditer(content, self._pos):
+            if not self._capture(match, final):
+                # The element continues in a chunk we have not seen yet
+                self._pos = match.start()
+                return
+            self._pos = match.end()
+            if self.complete:
+                return
+        if not final:
+            self._pos = max(self._pos, len(content) - _MARKER_OVERLAP)
+
+    def _capture(self, match, final: bool) -> bool:
+        """Record the field behind a marker; False if more bytes are needed"""
+        content = self.buffer
+        tag_start = content.rfind(b'<', 0, match.start())
+        tag_end = content.find(b'>', match.end())
+        if tag_end == -1:
+            return final
+        if tag_start == -1:
+            return True
+
+        marker_id = match.group('id')
+        if marker_id == b'landingImage':
+            if self.image_url is None:
+                src = _SRC_ATTR.search(content, tag_start, tag_end)
+                self.image_url = _decode(src.group(1)) if src else ""
+            return True
+
+        if marker_id == b'availability':
+            if self.availability is None:
+                window_end = tag_end + 1 + _AVAILABILITY_WINDOW
+                span = _SPAN_TEXT.search(content, tag_end + 1, window_end)
+                if span is None and not final and len(content) < window_end:
+                    return False
+                self.availability = "In Stock"
+                if span and "out of stock" in _TAGS.sub('', _decode(span.group(1))).lower():
+                    self.availability = "Out of Stock"
+            return True
+
+        # Remaining markers take the text node right after the start tag
+        text_end = content.find(b'<', tag_end + 1)
+        if text_end == -1:
+            if not final:
+                return False
+            text = ""
+        else:
+            text = _decode(content[tag_end + 1:text_end]).strip()
+
+        if marker_id == b'productTitle':
+            if self.product_name is None:
+                self.product_name = text
+        elif b'a-price-whole' in match.group('cls').split():
+            if self.price_whole is None:
+                self.price_whole = text
+        elif self.price_offscreen is None:
+            self.price_offscreen = text
+        return True
+
+def extract_fast(content: bytes) -> Optional[ProductFields]:
+    """Pull the product fields with a single targeted scan.
+
+    Returns None when the title, price or image cannot be found so the caller
+    can fall back to the full BeautifulSoup parse.
+    """
+    scanner = FastScanner()
+    scanner.buffer = content
+    return scanner.finish()
+
+def extract_soup(content: bytes) -> ProductFields:
+    """Pull the product fields from a full BeautifulSoup tree"""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Extract product name
+    title_selectors = [
+        '#productTitle',
+        '.product-title',
+        '[data-automation-id="product-title"]'
+    ]
+
+    product_name = "Product Name Not Found"
+    for selector in title_selectors:
+        title_elem = soup.select_one(selector)
+        if title_elem:
+            product_name = title_elem.get_text().strip()
+            break
+
+    # Extract price
+    price_selectors = [
+        '.a-price-whole',
+        '.a-offscreen',
+        '.a-price .a-offscreen',
+        '[data-automation-id="price"]',
+        '.a-price-range .a-offscreen'
+    ]
+
+    current_price = 0.0
+    for selector in price_selectors:
+        price_elem = soup.select_one(selector)
+        if price_elem:
+            price = parse_price(price_elem.get_text())
+            if price is not None:
+                current_price = price
+                break
+
+    # Extract image URL
+    image_selectors = [
+        '#landingImage',
+        '.a-dynamic-image',
+        '[data-automation-id="product-image"]'
+    ]
+
+    image_url = ""
+    for selector in image_selectors:
+        img_elem = soup.select_one(selector)
+        if img_elem:
+            image_url = img_elem.get('src') or img_elem.get('data-src', '')
+            if image_url:
+                break
+
+    # Check availability
+    availability = "In Stock"
+    availability_elem = soup.select_one('#availability span')
+    if availability_elem:
+        availability_text = availability_elem.get_text().strip()
+        if "out of stock" in availability_text.lower():
+            availability = "Out of Stock"
+
+    return ProductFields(
+        product_name=product_name,
+        current_price=current_price,
+        image_url=str(image_url or ""),
+        availability=availability
+    )
+
+def _extract_fast_or_soup(content: bytes) -> ProductFields:
+    return extract_fast(content) or extract_soup(content)
+
+EXTRACTORS: Dict[str, Callable[[bytes], ProductFields]] = {
+    "fast": _extract_fast_or_soup,
+    "soup": extract_soup,
+}
+
+def extract_product_fields(content: bytes, engine: str = SCRAPER_EXTRACTOR) -> ProductFields:
+    """Extract product fields from a page with the configured engine"""
+    try:
+        extractor = EXTRACTORS[engine]
+    except KeyError:
+        raise ValueError(f"Unknown extractor engine: {engine}")
+    return extractor(content)
+
+class ParsePool:
+    """Runs BeautifulSoup parses in worker processes, off the event loop and its GIL.
+
+    The fast-path scan runs inline; only pages it cannot handle (and every
+    page with the "soup" engine) are sent to the workers.
+    """
+
+    def __init__(self, size: int = PARSE_POOL_SIZE, engine: str = SCRAPER_EXTRACTOR):
+        self.size = size
+        self.engine = engine
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn rather than fork so workers don't inherit gRPC/Firebase state
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def extract(self, content: bytes) -> ProductFields:
+        """Extract product fields from page bytes, parsing the full tree in a worker"""
+        if self.engine not in EXTRACTORS:
+            raise ValueError(f"Unknown extractor engine: {self.engine}")
+        if self.engine == "fast":
+            fields = extract_fast(content)
+            if fields is not None:
+                return fields
+        if self.size <= 0:
+            return extract_soup(content)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), extract_soup, content)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool next time and parse this page inline
+            print("Parse pool broken, restarting")
+            self.shutdown()
+            return extract_soup(content)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
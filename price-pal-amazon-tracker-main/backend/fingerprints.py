@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from extractor import ProductFields
+from typing import Dict, NamedTuple, Optional
+import hashlib
+import os
+
+# Number of ASINs whose last-seen fingerprint is remembered
+FINGERPRINT_STORE_SIZE = int(os.getenv("FINGERPRINT_STORE_SIZE", "100000"))
+
+class PageFingerprint(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: Optional[str]
+    # Price last applied for this page, for trackers that catch up later
+    price: Optional[float] = None
+
+def fields_digest(fields: ProductFields) -> str:
+    """Hash the values the extractor read, so a change to any of them shows"""
+    values = "\x1f".join((
+        fields.product_name,
+        repr(fields.current_price),
+        fields.image_url,
+        fields.availability
+    ))
+    return hashlib.blake2b(values.encode(), digest_size=16).hexdigest()
+
+class FingerprintStore:
+    """Bounded per-ASIN record of the last page version we acted on"""
+
+    def __init__(self, max_size: int = FINGERPRINT_STORE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, PageFingerprint]" = OrderedDict()
+
+    def get(self, asin: str) -> Optional[PageFingerprint]:
+        return self._entries.get(asin)
+
+    def conditional_headers(self, asin: str) -> Dict[str, str]:
+        """Validators to send so an unchanged page can come back as 304"""
+        fingerprint = self._entries.get(asin)
+        headers = {}
+        if fingerprint is not None:
+            if fingerprint.etag:
+                headers["If-None-Match"] = fingerprint.etag
+            if fingerprint.last_modified:
+                headers["If-Modified-Since"] = fingerprint.last_modified
+        return headers
+
+    def is_unchanged(self, asin: str, fingerprint: PageFingerprint) -> bool:
+        previous = self._entries.get(asin)
+        return (
+            previous is not None
+            and fingerprint.digest is not None
+            and previous.digest == fingerprint.digest
+        )
+
+    def record(self, asin: str, fingerprint: PageFingerprint):
+        """Remember a fingerprint once its page has been fully processed"""
+        self._entries[asin] = fingerprint
+        self._entries.move_to_end(asin)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, asin: str):
+        """Forget a page so its next check is parsed and applied in full"""
+        self._entries.pop(asin, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,9 +1,15 @@
 
 
+import asyncio
 import firebase_admin
+from concurrent.futures import ThreadPoolExecutor
 from firebase_admin import credentials, firestore, auth
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore_v1.field_path import FieldPath
+import functools
 import os
-from typing import Dict, Any
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional
 from dotenv import load_dotenv
 
 
@@ -21,22 +27,163 @@ except ValueError:
     # App already initialized
     pass
 
-# Firestore client
-db = firestore.client()
+# Threads for blocking Firestore calls made from async code
+FIRESTORE_THREADS = int(os.getenv("FIRESTORE_THREADS", "16"))
+
+_db = None
+_db_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_db():
+    """Firestore client, created on first use instead of at import"""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = firestore.client()
+    return _db
+
+async def run_blocking(fn: Callable, *args, **kwargs):
+    """Run a blocking Firestore/Firebase call without stalling the event loop"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=FIRESTORE_THREADS, thread_name_prefix="firestore"
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+# Documents fetched per round trip by the paginated queries
+QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", "300"))
+
+class QueryPage(NamedTuple):
+    documents: List[Dict[str, Any]]
+    # Pass as start_after to resume after this page; None on the last page
+    cursor: Optional[str]
+
+# Most values Firestore accepts in one 'in' filter
+QUERY_IN_LIMIT = 30
+
+# Firestore accepts at most 500 writes in one batch
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+# Seconds a buffered write may wait before its batch is committed anyway
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "2"))
+
+class WriteFailure(NamedTuple):
+    collection: str
+    doc_id: str
+    data: Dict[str, Any]
+    error: str
+
+class WriteBuffer:
+    """Collects document updates and commits them as batched writes.
+
+    Updates are flushed once a full batch is waiting or when the flush
+    interval passes. Failures are kept until the next explicit flush(),
+    which returns them so callers can retry the affected documents.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = WRITE_BATCH_SIZE,
+        flush_interval: float = WRITE_FLUSH_INTERVAL
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Later updates to a waiting document are merged into one write
+        self._pending: Dict[tuple, Dict[str, Any]] = {}
+        self._failures: List[WriteFailure] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self.counters = {"queued": 0, "batches": 0, "written": 0, "failed": 0}
+
+    async def update(self, collection_name: str, doc_id: str, data: Dict[str, Any]):
+        self._pending.setdefault((collection_name, doc_id), {}).update(data)
+        self.counters["queued"] += 1
+        if len(self._pending) >= self.batch_size:
+            await self._flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(
+                self.flush_interval, lambda: asyncio.ensure_future(self._flush())
+            )
+
+    async def flush(self) -> List[WriteFailure]:
+        """Commit everything waiting and return the failures since the last flush"""
+        await self._flush()
+        failures, self._failures = self._failures, []
+        return failures
+
+    async def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            writes = list(pending.items())
+            for start in range(0, len(writes), self.batch_size):
+                chunk = writes[start:start + self.batch_size]
+                self._failures.extend(await run_blocking(self._commit, chunk))
+
+    def _commit(self, writes: List[tuple]) -> List[WriteFailure]:
+        batch = get_db().batch()
+        for (collection_name, doc_id), data in writes:
+            batch.update(get_db().collection(collection_name).document(doc_id), data)
+        try:
+            batch.commit()
+            self.counters["batches"] += 1
+            self.counters["written"] += len(writes)
+            return []
+        except Exception as e:
+            print(f"Batched write of {len(writes)} documents failed, retrying individually: {e}")
+
+        # A batch is all-or-nothing, so find out which documents were at fault
+        failures = []
+        for (collection_name, doc_id), data in writes:
+            try:
+                get_db().collection(collection_name).document(doc_id).update(data)
+                self.counters["written"] += 1
+            except Exception as e:
+                failures.append(WriteFailure(collection_name, doc_id, data, str(e)))
+        self.counters["failed"] += len(failures)
+        return failures
+
+    def stats(self) -> dict:
+        return {**self.counters, "pending": len(self._pending)}
+
+write_buffer = WriteBuffer()
 
 class FirebaseService:
     @staticmethod
     def get_collection(collection_name: str):
-        return db.collection(collection_name)
+        return get_db().collection(collection_name)
+    
+    @staticmethod
+    def transaction():
+        return get_db().transaction()
     
     @staticmethod
     def add_document(collection_name: str, data: Dict[Any, Any]) -> str:
-        doc_ref = db.collection(collection_name).add(data)
+        doc_ref = get_db().collection(collection_name).add(data)
         return doc_ref[1].id
     
     @staticmethod
-    def get_document(collection_name: str, doc_id: str):
-        doc = db.collection(collection_name).document(doc_id).get()
+    def create_document(collection_name: str, doc_id: str, data: Dict[Any, Any]) -> bool:
+        """Create a document under a chosen ID; False if that ID is already taken"""
+        try:
+            get_db().collection(collection_name).document(doc_id).create(data)
+            return True
+        except AlreadyExists:
+            return False
+    
+    @staticmethod
+    def get_document(
+        collection_name: str,
+        doc_id: str,
+        fields: Optional[List[str]] = None
+    ):
+        """Fetch a document, or only the given fields of it"""
+        doc = get_db().collection(collection_name).document(doc_id).get(field_paths=fields)
         if doc.exists:
             data = doc.to_dict() or {}
             return {"id": doc.id, **data}
@@ -44,15 +191,171 @@ class FirebaseService:
     
     @staticmethod
     def update_document(collection_name: str, doc_id: str, data: Dict[Any, Any]):
-        db.collection(collection_name).document(doc_id).update(data)
+        get_db().collection(collection_name).document(doc_id).update(data)
+    
+    @staticmethod
+    async def buffered_update(collection_name: str, doc_id: str, data: Dict[Any, Any]):
+        """Queue an update to be committed with others in a batched write"""
+        await write_buffer.update(collection_name, doc_id, data)
+    
+    @staticmethod
+    async def flush_writes() -> List[WriteFailure]:
+        return await write_buffer.flush()
+    
+    @staticmethod
+    def write_stats() -> dict:
+        return write_buffer.stats()
     
     @staticmethod
     def delete_document(collection_name: str, doc_id: str):
-        db.collection(collection_name).document(doc_id).delete()
+        get_db().collection(collection_name).document(doc_id).delete()
+    
+    @staticmethod
+    def query_documents(
+        collection_name: str,
+        field: str,
+        operator: str,
+        value: Any,
+        fields: Optional[List[str]] = None
+    ):
+        """Run an equality/range query; fields limits what each result carries"""
+        query = get_db().collection(collection_name).where(field, operator, value)
+        if fields is not None:
+            query = query.select(fields)
+        return [{"id": doc.id, **(doc.to_dict() or {})} for doc in query.stream()]
     
     @staticmethod
-    def query_documents(collection_name: str, field: str, operator: str, value: Any):
-        docs = db.collection(collection_name).where(field, operator, value).stream()
-        return [{"id": doc.id, **doc.to_dict()} for doc in docs]
+    def get_documents_by(
+        collection_name: str,
+        field: str,
+        values: List[Any],
+        fields: Optional[List[str]] = None
+    ) -> Dict[Any, Dict[str, Any]]:
+        """Load the documents whose field matches any of values, keyed by that value"""
+        documents = {}
+        values = list(dict.fromkeys(values))
+        for start in range(0, len(values), QUERY_IN_LIMIT):
+            chunk = values[start:start + QUERY_IN_LIMIT]
+            for document in FirebaseService.query_documents(
+                collection_name, field, "in", chunk, fields
+            ):
+                documents.setdefault(document.get(field), document)
+        return documents
+    
+    @staticmethod
+    def query_pages(
+        collection_name: str,
+        field: Optional[str] = None,
+        operator: Optional[str] = None,
+        value: Any = None,
+        page_size: int = QUERY_PAGE_SIZE,
+        start_after: Optional[str] = None
+    ) -> Iterator[QueryPage]:
+        """Yield a query's results a page at a time, ordered by document ID.
+
+        Leave field unset to read the whole collection. Only one page is held
+        in memory, and a run can be resumed from any page's cursor.
+        """
+        query = get_db().collection(collection_name)
+        if field is not None:
+            query = query.where(field, operator, value)
+        query = query.order_by(FieldPath.document_id()).limit(page_size)
+        
+        while True:
+            page_query = query
+            if start_after is not None:
+                page_query = query.start_after({FieldPath.document_id(): start_after})
+            documents = [{"id": doc.id, **(doc.to_dict() or {})} for doc in page_query.stream()]
+            if not documents:
+                return
+            start_after = documents[-1]["id"] if len(documents) == page_size else None
+            yield QueryPage(documents, start_after)
+            if start_after is None:
+                return
+    
+    @staticmethod
+    async def stream_documents(
+        collection_name: str,
+        field: Optional[str] = None,
+        operator: Optional[str] = None,
+        value: Any = None,
+        page_size: int = QUERY_PAGE_SIZE,
+        start_after: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async iteration over query_pages for use from the event loop.
+
+        Pages are fetched in a worker thread, and the next page is requested
+        while the caller is still working through the current one.
+        """
+        pages = FirebaseService.query_pages(
+            collection_name, field, operator, value, page_size, start_after
+        )
+        next_page = asyncio.ensure_future(run_blocking(next, pages, None))
+        try:
+            while next_page is not None:
+                page = await next_page
+                next_page = None
+                if page is None:
+                    return
+                if page.cursor is not None:
+                    next_page = asyncio.ensure_future(run_blocking(next, pages, None))
+                for document in page.documents:
+                    yield document
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+class AsyncFirebaseService(FirebaseService):
+    """FirebaseService for async code: the document calls return awaitables
+    and run on the Firestore thread pool, so independent reads can be gathered.
+    """
+
+    @staticmethod
+    async def add_document(collection_name: str, data: Dict[Any, Any]) -> str:
+        return await run_blocking(FirebaseService.add_document, collection_name, data)
+    
+    @staticmethod
+    async def create_document(collection_name: str, doc_id: str, data: Dict[Any, Any]) -> bool:
+        return await run_blocking(FirebaseService.create_document, collection_name, doc_id, data)
+    
+    @staticmethod
+    async def get_document(
+        collection_name: str,
+        doc_id: str,
+        fields: Optional[List[str]] = None
+    ):
+        return await run_blocking(FirebaseService.get_document, collection_name, doc_id, fields)
+    
+    @staticmethod
+    async def update_document(collection_name: str, doc_id: str, data: Dict[Any, Any]):
+        await run_blocking(FirebaseService.update_document, collection_name, doc_id, data)
+    
+    @staticmethod
+    async def delete_document(collection_name: str, doc_id: str):
+        await run_blocking(FirebaseService.delete_document, collection_name, doc_id)
+    
+    @staticmethod
+    async def query_documents(
+        collection_name: str,
+        field: str,
+        operator: str,
+        value: Any,
+        fields: Optional[List[str]] = None
+    ):
+        return await run_blocking(
+            FirebaseService.query_documents, collection_name, field, operator, value, fields
+        )
+
+    @staticmethod
+    async def get_documents_by(
+        collection_name: str,
+        field: str,
+        values: List[Any],
+        fields: Optional[List[str]] = None
+    ) -> Dict[Any, Dict[str, Any]]:
+        return await run_blocking(
+            FirebaseService.get_documents_by, collection_name, field, values, fields
+        )
 
 firebase_service = FirebaseService()
+async_firebase_service = AsyncFirebaseService()
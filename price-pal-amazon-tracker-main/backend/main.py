@@ -7,9 +7,13 @@ from contextlib import asynccontextmanager
 import logging
 
 from auth import get_current_user
+from coordination import coordinator
+from email_service import email_service
+from firebase_config import async_firebase_service
 from models import User
 from price_checker import PriceChecker
-from scheduler import start_scheduler
+from scheduler import start_scheduler, stop_scheduler
+from scraper import scraper
 import crud
 
 security = HTTPBearer()
@@ -17,10 +21,19 @@ security = HTTPBearer()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    email_service.start()
     start_scheduler()
     yield
     # Shutdown
-    pass
+    stop_scheduler()
+    # Land the buffered writes of an interrupted sweep; its alert mails are
+    # already in the outbox
+    failures = await async_firebase_service.flush_writes()
+    if failures:
+        logger.error(f"{len(failures)} buffered writes failed at shutdown")
+    await coordinator.release_all()
+    await scraper.close()
+    await email_service.close()
 
 
 # Set up logging
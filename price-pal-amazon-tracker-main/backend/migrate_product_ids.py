@@ -0,0 +1,56 @@
+from firebase_admin import firestore
+from firebase_config import firebase_service
+from price_checker import product_document_id
+import sys
+
+def rekey(product: dict) -> str:
+    """Move one legacy tracking document to its {user_id}_{asin} ID.
+
+    If the user already has a document under the new ID, the legacy one is
+    a duplicate and is folded into it, keeping whichever is still active.
+    """
+    collection = firebase_service.get_collection("products")
+    legacy_ref = collection.document(product["id"])
+    target_ref = collection.document(product_document_id(product["user_id"], product["asin"]))
+
+    @firestore.transactional
+    def move(transaction) -> str:
+        legacy = legacy_ref.get(transaction=transaction)
+        if not legacy.exists:
+            return "gone"
+        data = legacy.to_dict() or {}
+        target = target_ref.get(transaction=transaction)
+        if not target.exists:
+            outcome = "rekeyed"
+            transaction.set(target_ref, data)
+        else:
+            outcome = "merged"
+            if data.get("is_active") and not (target.to_dict() or {}).get("is_active"):
+                transaction.set(target_ref, data)
+        transaction.delete(legacy_ref)
+        return outcome
+
+    return move(firebase_service.transaction())
+
+def migrate(dry_run: bool = False) -> dict:
+    """Re-key every product document created before IDs were derived from user and ASIN"""
+    stats = {"scanned": 0, "current": 0, "skipped": 0, "rekeyed": 0, "merged": 0, "gone": 0}
+    for page in firebase_service.query_pages("products"):
+        for product in page.documents:
+            stats["scanned"] += 1
+            if not product.get("user_id") or not product.get("asin"):
+                stats["skipped"] += 1
+                continue
+            if product["id"] == product_document_id(product["user_id"], product["asin"]):
+                stats["current"] += 1
+                continue
+            if dry_run:
+                stats["rekeyed"] += 1
+                continue
+            stats[rekey(product)] += 1
+        print(f"Scanned {stats['scanned']} products, resume after {page.cursor}")
+    return stats
+
+if __name__ == "__main__":
+    # Pass --dry-run to count the legacy documents without touching them
+    print(migrate(dry_run="--dry-run" in sys.argv[1:]))
@@ -0,0 +1,234 @@
+from typing import Dict, Iterable, List, Optional, Set
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import random
+import time
+
+# Adaptive polling configuration
+POLL_TICK_MINUTES = float(os.getenv("POLL_TICK_MINUTES", "5"))
+POLL_MIN_INTERVAL_MINUTES = float(os.getenv("POLL_MIN_INTERVAL_MINUTES", "60"))
+POLL_MAX_INTERVAL_MINUTES = float(os.getenv("POLL_MAX_INTERVAL_MINUTES", "720"))
+POLL_OUT_OF_STOCK_MINUTES = float(os.getenv("POLL_OUT_OF_STOCK_MINUTES", "720"))
+# Products this far (relative) above their target are polled at the max interval
+POLL_FAR_FROM_TARGET = float(os.getenv("POLL_FAR_FROM_TARGET", "0.5"))
+# How strongly recent price movement shortens the interval
+POLL_VOLATILITY_WEIGHT = float(os.getenv("POLL_VOLATILITY_WEIGHT", "20"))
+POLL_VOLATILITY_ALPHA = float(os.getenv("POLL_VOLATILITY_ALPHA", "0.3"))
+# Reload the active product list this often to pick up adds and deletes
+POLL_RESYNC_MINUTES = float(os.getenv("POLL_RESYNC_MINUTES", "360"))
+# Random +/- fraction applied to every interval so checks don't re-align
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.1"))
+# Per-tick capacity relative to an even split of the catalog over the wheel
+POLL_TICK_HEADROOM = float(os.getenv("POLL_TICK_HEADROOM", "1.25"))
+
+def wheel_slot(product_id: str, buckets: int) -> int:
+    """Stable time-wheel bucket for a product, the same on every replica"""
+    digest = hashlib.md5(product_id.encode()).digest()
+    return int.from_bytes(digest[:4], "big") % buckets
+
+def poll_interval(
+    current_price: float,
+    target_price: float,
+    volatility: float = 0.0,
+    availability: Optional[str] = None
+) -> float:
+    """Seconds until a product should be checked again.
+
+    Products close to their target and products whose price has been moving
+    are polled often; stable products far from their target and items that
+    are out of stock are polled rarely.
+    """
+    min_interval = POLL_MIN_INTERVAL_MINUTES * 60
+    max_interval = POLL_MAX_INTERVAL_MINUTES * 60
+
+    if target_price > 0:
+        gap = (current_price - target_price) / target_price
+    else:
+        gap = POLL_FAR_FROM_TARGET
+    closeness = min(1.0, max(0.0, gap / POLL_FAR_FROM_TARGET))
+
+    interval = min_interval + (max_interval - min_interval) * closeness
+    interval /= 1 + POLL_VOLATILITY_WEIGHT * volatility
+    interval = min(max_interval, max(min_interval, interval))
+
+    if availability == "Out of Stock":
+        interval = max(interval, POLL_OUT_OF_STOCK_MINUTES * 60)
+    return interval
+
+class ScheduleEntry:
+    __slots__ = ("product", "due_at", "volatility", "availability", "queued")
+
+    def __init__(self, product: dict, due_at: float):
+        self.product = product
+        self.due_at = due_at
+        self.volatility = 0.0
+        self.availability = None
+        # False once due() has handed the product out and until it is rescheduled
+        self.queued = False
+
+class PollingSchedule:
+    """Per-product next-check times kept in a min-heap.
+
+    The schedule lives in memory: it is rebuilt from the active products
+    on sync() and every check reschedules its product, so polling does not
+    cost an extra datastore write per check.
+
+    Load is spread with a time wheel: the minimum interval is cut into one
+    bucket per tick, newly synced products start in their hashed bucket
+    rather than all at once, and each tick takes at most about one bucket's
+    share of the catalog. Anything beyond that stays due and shows up as
+    backlog and lag.
+    """
+
+    def __init__(
+        self,
+        resync_interval: float = POLL_RESYNC_MINUTES * 60,
+        tick: float = POLL_TICK_MINUTES * 60,
+        wheel_span: float = POLL_MIN_INTERVAL_MINUTES * 60
+    ):
+        self.resync_interval = resync_interval
+        self.tick = tick
+        self.buckets = max(1, round(wheel_span / tick))
+        self.last_sync = None
+        self._entries: Dict[str, ScheduleEntry] = {}
+        self._heap: list = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._entries
+
+    def needs_sync(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return self.last_sync is None or now - self.last_sync >= self.resync_interval
+
+    def sync(self, products: Iterable[dict], now: Optional[float] = None):
+        """Reconcile with the current list of active products"""
+        now = time.time() if now is None else now
+        active_ids = set()
+        for product in products:
+            active_ids.add(product["id"])
+            self.track(product, now)
+        self.prune(active_ids, now)
+
+    def track(self, product: dict, now: Optional[float] = None):
+        """Start tracking a product in its wheel slot, or refresh its data.
+
+        A product that due() handed out but that was never rescheduled
+        (its check was cut short) is made due again.
+        """
+        entry = self._entries.get(product["id"])
+        now = time.time() if now is None else now
+        if entry is None:
+            self.add(product, now + wheel_slot(product["id"], self.buckets) * self.tick)
+        elif not entry.queued:
+            self.add(product, now)
+        else:
+            entry.product = product
+
+    def prune(self, active_ids: Set[str], now: Optional[float] = None):
+        """Drop products that are no longer active and mark the schedule synced"""
+        for product_id in list(self._entries):
+            if product_id not in active_ids:
+                del self._entries[product_id]
+        self.last_sync = time.time() if now is None else now
+
+    def add(self, product: dict, due_at: Optional[float] = None):
+        """Track a product, due immediately unless due_at is given"""
+        due_at = time.time() if due_at is None else due_at
+        entry = self._entries.get(product["id"])
+        if entry is None:
+            entry = self._entries[product["id"]] = ScheduleEntry(product, due_at)
+        else:
+            entry.product = product
+            entry.due_at = due_at
+        entry.queued = True
+        heapq.heappush(self._heap, (due_at, next(self._counter), product["id"]))
+
+    def remove(self, product_id: str):
+        # The heap item is dropped lazily when it reaches the top
+        self._entries.pop(product_id, None)
+
+    def due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[dict]:
+        """Pop the products whose next check time has passed"""
+        now = time.time() if now is None else now
+        products = []
+        while self._heap and self._heap[0][0] <= now:
+            if limit is not None and len(products) >= limit:
+                break
+            due_at, _, product_id = heapq.heappop(self._heap)
+            entry = self._entries.get(product_id)
+            if entry is None or entry.due_at != due_at:
+                continue  # removed or rescheduled since this item was pushed
+            entry.queued = False
+            products.append(entry.product)
+        return products
+
+    def reschedule(
+        self,
+        product: dict,
+        current_price: float,
+        availability: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> Optional[float]:
+        """Record a check result and schedule the product's next check"""
+        entry = self._entries.get(product["id"])
+        if entry is None:
+            return None
+        now = time.time() if now is None else now
+
+        previous_price = entry.product.get("current_price")
+        if previous_price:
+            change = abs(current_price - previous_price) / previous_price
+            entry.volatility = (
+                POLL_VOLATILITY_ALPHA * change
+                + (1 - POLL_VOLATILITY_ALPHA) * entry.volatility
+            )
+        if availability is not None:
+            entry.availability = availability
+
+        interval = poll_interval(
+            current_price,
+            product.get("target_price", 0),
+            entry.volatility,
+            entry.availability
+        )
+        interval *= 1 + random.uniform(-POLL_JITTER, POLL_JITTER)
+        self.add(product, now + interval)
+        return interval
+
+    def retry_later(self, product: dict, now: Optional[float] = None):
+        """Schedule a failed check for another attempt after the minimum interval"""
+        if product["id"] in self._entries:
+            now = time.time() if now is None else now
+            self.add(product, now + POLL_MIN_INTERVAL_MINUTES * 60)
+
+    def tick_limit(self) -> int:
+        """Most products one tick should take on"""
+        return max(1, math.ceil(len(self._entries) / self.buckets * POLL_TICK_HEADROOM))
+
+    def stats(self, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        backlog = 0
+        oldest_due = None
+        next_due = None
+        for entry in self._entries.values():
+            if entry.due_at <= now:
+                backlog += 1
+                if oldest_due is None or entry.due_at < oldest_due:
+                    oldest_due = entry.due_at
+            elif next_due is None or entry.due_at < next_due:
+                next_due = entry.due_at
+        return {
+            "tracked": len(self._entries),
+            "tick_limit": self.tick_limit(),
+            "backlog": backlog,
+            # How far behind schedule the most overdue product is
+            "lag": round(now - oldest_due, 1) if oldest_due is not None else 0.0,
+            "next_due_in": round(next_due - now, 1) if next_due is not None else None
+        }
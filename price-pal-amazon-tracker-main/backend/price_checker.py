@@ -1,127 +1,49 @@
 
 from fastapi import APIRouter, HTTPException, Depends
-import requests
-from bs4 import BeautifulSoup
-import re
 from models import ProductCreate, ProductResponse
 from auth import get_current_user
-from firebase_config import firebase_service
+from coordination import SweepCoordinator, coordinator
+from email_service import email_service
+from firebase_config import async_firebase_service
+from polling import PollingSchedule
+from scraper import AmazonScraper, scraper
+from user_cache import user_cache
 from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
 import json
+import os
+import time
 
 router = APIRouter()
 
-class AmazonScraper:
-    def __init__(self):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.9'
-        }
-    
-    def extract_asin(self, url: str) -> str:
-        """Extract ASIN from Amazon URL"""
-        patterns = [
-            r'/dp/([A-Z0-9]{10})',
-            r'/product/([A-Z0-9]{10})',
-            r'asin=([A-Z0-9]{10})',
-            r'/([A-Z0-9]{10})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        
-        raise ValueError("Could not extract ASIN from URL")
-    
-    def scrape_product(self, url: str) -> ProductResponse:
-        """Scrape product details from Amazon"""
-        try:
-            asin = self.extract_asin(url)
-            
-            # Clean URL
-            clean_url = f"https://www.amazon.in/dp/{asin}"
-            
-            response = requests.get(clean_url, headers=self.headers, timeout=10)
-            print("Status code:", response.status_code)
-            print("First 1000 chars of HTML:\n", response.content[:1000])
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract product name
-            title_selectors = [
-                '#productTitle',
-                '.product-title',
-                '[data-automation-id="product-title"]'
-            ]
-            
-            product_name = "Product Name Not Found"
-            for selector in title_selectors:
-                title_elem = soup.select_one(selector)
-                if title_elem:
-                    product_name = title_elem.get_text().strip()
-                    break
-            
-            # Extract price
-            price_selectors = [
-                '.a-price-whole',
-                '.a-offscreen',
-                '.a-price .a-offscreen',
-                '[data-automation-id="price"]',
-                '.a-price-range .a-offscreen'
-            ]
-            
-            current_price = 0.0
-            for selector in price_selectors:
-                price_elem = soup.select_one(selector)
-                if price_elem:
-                    price_text = price_elem.get_text().strip()
-                    # Extract numeric value
-                    price_match = re.search(r'[\d,]+\.?\d*', price_text.replace(',', ''))
-                    if price_match:
-                        current_price = float(price_match.group())
-                        break
-            
-            # Extract image URL
-            image_selectors = [
-                '#landingImage',
-                '.a-dynamic-image',
-                '[data-automation-id="product-image"]'
-            ]
-            
-            image_url = ""
-            for selector in image_selectors:
-                img_elem = soup.select_one(selector)
-                if img_elem:
-                    image_url = img_elem.get('src') or img_elem.get('data-src', '')
-                    if image_url:
-                        break
-            
-            # Check availability
-            availability = "In Stock"
-            availability_elem = soup.select_one('#availability span')
-            if availability_elem:
-                availability_text = availability_elem.get_text().strip()
-                if "out of stock" in availability_text.lower():
-                    availability = "Out of Stock"
-            
-            return ProductResponse(
-                product_name=product_name,
-                current_price=current_price,
-                image_url=str(image_url or ""),
-                asin=asin,
-                amazon_url=clean_url,
-                availability=availability
-            )
-            
-        except Exception as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Error scraping product: {str(e)}"
-            )
+# Sweep configuration
+SWEEP_CONCURRENCY = int(os.getenv("SWEEP_CONCURRENCY", "10"))
+# Per-run time budget in seconds; 0 disables the budget
+SWEEP_TIME_BUDGET = float(os.getenv("SWEEP_TIME_BUDGET", "0"))
+# Documents added before IDs were derived from user and ASIN have random IDs,
+# so the add-to-cart duplicate check also looks them up; turn this off once
+# migrate_product_ids.py has re-keyed them
+LEGACY_DUPLICATE_CHECK = os.getenv("LEGACY_DUPLICATE_CHECK", "true").lower() == "true"
+# How often paused workers look at the circuit breaker again
+BREAKER_RECHECK_SECONDS = float(os.getenv("BREAKER_RECHECK_SECONDS", "1"))
+# Users with at least this many alerts in a sweep get one digest email
+# instead of an alert and a thank-you per product
+ALERT_DIGEST = os.getenv("ALERT_DIGEST", "true").lower() == "true"
+ALERT_DIGEST_MIN_PRODUCTS = int(os.getenv("ALERT_DIGEST_MIN_PRODUCTS", "2"))
 
-scraper = AmazonScraper()
+def product_document_id(user_id: str, asin: str) -> str:
+    """Deterministic ID of a user's tracking document for an ASIN"""
+    return f"{user_id}_{asin}"
+
+async def legacy_cart_asins(user_id: str) -> Set[str]:
+    """ASINs in a user's cart, found by query so random-ID documents count too"""
+    if not LEGACY_DUPLICATE_CHECK:
+        return set()
+    products = await async_firebase_service.query_documents(
+        "products", "user_id", "==", user_id, fields=["asin"]
+    )
+    return {product.get("asin") for product in products}
 
 @router.post("/fetch-product", response_model=ProductResponse)
 async def fetch_product_details(product_data: dict):
@@ -133,7 +55,17 @@ async def fetch_product_details(product_data: dict):
             detail="Amazon URL is required"
         )
     
-    return scraper.scrape_product(amazon_url)
+    return await scraper.scrape_product(amazon_url)
+
+@router.get("/scraper-stats")
+async def get_scraper_stats():
+    """Scraper cache and request coalescing counters"""
+    return {
+        **scraper.stats(),
+        "coordination": coordinator.stats(),
+        "writes": async_firebase_service.write_stats(),
+        "email": email_service.stats()
+    }
 
 @router.post("/add-to-cart", response_model=dict)
 async def add_product_to_cart(
@@ -142,20 +74,18 @@ async def add_product_to_cart(
 ):
     """Add product to user's cart for price tracking"""
     try:
-        # Scrape current product details
-        product_details = scraper.scrape_product(product_data.amazon_url)
-        
-        # Check if product already exists for this user
-        existing_products = firebase_service.query_documents(
-            "products", "user_id", "==", current_user["uid"]
+        # Scrape the product while the user and cart lookups are in flight
+        product_details, user, cart_asins = await asyncio.gather(
+            scraper.scrape_product(product_data.amazon_url),
+            user_cache.get(current_user["uid"]),
+            legacy_cart_asins(current_user["uid"])
         )
         
-        for product in existing_products:
-            if product.get("asin") == product_details.asin:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Product already in your cart"
-                )
+        if product_details.asin in cart_asins:
+            raise HTTPException(
+                status_code=400,
+                detail="Product already in your cart"
+            )
         
         # Create product document
         product_doc = {
@@ -171,12 +101,21 @@ async def add_product_to_cart(
             "is_active": True
         }
         
-        product_id = firebase_service.add_document("products", product_doc)
+        # One document per (user, ASIN): creating it fails if the product is
+        # already in the cart, even when two adds race
+        product_id = product_document_id(current_user["uid"], product_details.asin)
+        if not await async_firebase_service.create_document("products", product_id, product_doc):
+            raise HTTPException(
+                status_code=400,
+                detail="Product already in your cart"
+            )
+        
+        # Products in another replica's shard are picked up by its next resync
+        if price_checker.owns(product_doc):
+            price_checker.schedule.add({"id": product_id, **product_doc})
 
         # Send tracking started email to user
-        users = firebase_service.query_documents("users", "uid", "==", current_user["uid"])
-        if users:
-            user = users[0]
+        if user:
             from email_service import send_tracking_started_email
             try:
                 result = await send_tracking_started_email(
@@ -200,6 +139,8 @@ async def add_product_to_cart(
             "product": product_doc
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -207,57 +148,441 @@ async def add_product_to_cart(
         )
 
 class PriceChecker:
-    def __init__(self):
-        self.scraper = AmazonScraper()
+    def __init__(
+        self,
+        scraper: AmazonScraper = scraper,
+        coordinator: SweepCoordinator = coordinator
+    ):
+        self.scraper = scraper
+        self.coordinator = coordinator
+        self.schedule = PollingSchedule()
+        self._sweep_lock = asyncio.Lock()
+        self._shard_generation = None
+        # Pre-update values of documents whose buffered writes are unconfirmed
+        self._unconfirmed: Dict[str, Tuple[dict, dict]] = {}
+        # Document writes issued, and price updates that needed none
+        self.write_counts = {"writes": 0, "elided": 0}
+        # Products that reached their target, alerted together after the checks
+        self._pending_alerts: List[Tuple[dict, float]] = []
+        # Products alerted, and the alert emails queued for them
+        self.alert_counts = {"alerts": 0, "emails": 0}
     
-    async def check_all_products(self):
-        """Check prices for all active products"""
+    def owns(self, product: dict) -> bool:
+        """Whether this replica currently holds the shard for a product"""
+        return self.coordinator.owns(self.asin_key(product))
+    
+    async def stream_owned(self) -> AsyncIterator[dict]:
+        """Stream the active products in our shards, syncing the schedule as they arrive"""
+        self._shard_generation = self.coordinator.generation
+        active_ids = set()
+        products = async_firebase_service.stream_documents("products", "is_active", "==", True)
+        async for product in products:
+            if self.owns(product):
+                active_ids.add(product["id"])
+                self.schedule.track(product)
+                yield product
+        # Only a complete read may drop products from the schedule
+        self.schedule.prune(active_ids)
+    
+    async def sync_owned(self):
+        async for _ in self.stream_owned():
+            pass
+    
+    async def check_due_products(
+        self,
+        concurrency: int = SWEEP_CONCURRENCY,
+        time_budget: Optional[float] = SWEEP_TIME_BUDGET
+    ) -> dict:
+        """Check the products whose adaptive next-check time has passed.
+
+        Returns None without doing anything if the previous run is still
+        going, so overrunning ticks never overlap.
+        """
+        if self._sweep_lock.locked():
+            return None
+        
+        async with self._sweep_lock:
+            if not self.coordinator.owned_shards():
+                # No live shard leases: another replica may own our products
+                # now, so check nothing and resync once leases are back
+                self._shard_generation = None
+                due = []
+            else:
+                # Resync when our shards changed hands, not just on the timer
+                if (
+                    self.schedule.needs_sync()
+                    or self._shard_generation != self.coordinator.generation
+                ):
+                    await self.sync_owned()
+                due = self.schedule.due(limit=self.schedule.tick_limit())
+            
+            stats = await self.sweep(due, concurrency, time_budget)
+            stats["schedule"] = self.schedule.stats()
+            stats["shards"] = len(self.coordinator.owned_shards())
+            return stats
+    
+    async def sweep(
+        self,
+        products: List[dict],
+        concurrency: int = SWEEP_CONCURRENCY,
+        time_budget: Optional[float] = SWEEP_TIME_BUDGET
+    ) -> dict:
+        """Check a batch of products with a bounded worker pool"""
+        stats = {
+            "total": 0,
+            "unique_asins": 0,
+            "scraped_asins": 0,
+            "unchanged_asins": 0,
+            "skip_rate": 0.0,
+            "checked": 0,
+            "failed": 0,
+            "skipped": 0,
+            "breaker_pauses": 0,
+            "alerts": 0,
+            "alert_emails": 0,
+            "writes": 0,
+            "writes_elided": 0,
+            "write_failures": 0,
+            "elapsed": 0.0,
+            "products_per_sec": 0.0
+        }
+        started = time.monotonic()
+        deadline = started + time_budget if time_budget else None
+        writes_before = dict(self.write_counts)
+        emails_before = self.alert_counts["emails"]
+        pending: Dict[str, List[dict]] = {}
+        
         try:
-            # Get all active products
-            products = firebase_service.query_documents("products", "is_active", "==", True)
+            # Scrape each ASIN once, however many users track it
+            pending = self.group_by_asin(products)
+            stats["total"] = len(products)
+            stats["unique_asins"] = len(pending)
+            workers = max(1, min(concurrency, len(pending)))
+            queue: asyncio.Queue = asyncio.Queue()
+            for key in pending:
+                queue.put_nowait(key)
+            for _ in range(workers):
+                queue.put_nowait(None)
             
-            for product in products:
-                await self.check_single_product(product)
+            async def check_group(group: List[dict]):
+                # Stop picking up new work once the run is over budget
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.defer(group, stats)
+                    return
+                
+                # Pause the sweep while Amazon is rejecting us; a group the
+                # breaker refused goes back to waiting instead of failing
+                while True:
+                    if self.scraper.retry_after() > 0:
+                        stats["breaker_pauses"] += 1
+                        if not await self.wait_for_host(deadline):
+                            result = None
+                            break
+                    result = await self.check_asin_group(group)
+                    if result is not None:
+                        break
+                if result is None:
+                    self.defer(group, stats)
+                    return
+                
+                checked, failed, unchanged = result
+                stats["checked"] += checked
+                stats["failed"] += failed
+                stats["unchanged_asins"] += unchanged
+                stats["scraped_asins"] += 1
+            
+            async def worker():
+                while True:
+                    key = await queue.get()
+                    if key is None:
+                        return
+                    # A group leaves `pending` only once it is fully handled,
+                    # so one cut short by an error is deferred below
+                    await check_group(pending[key])
+                    del pending[key]
+            
+            tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # Stop the other workers before their groups are deferred
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            stats["alerts"] = await self.dispatch_alerts()
+            await self.confirm_writes(stats)
                 
         except Exception as e:
             print(f"Error checking prices: {e}")
+            # Groups no worker got to stay due rather than dropping off the schedule
+            for group in pending.values():
+                self.defer(group, stats)
+        
+        stats["writes"] = self.write_counts["writes"] - writes_before["writes"]
+        stats["writes_elided"] = self.write_counts["elided"] - writes_before["elided"]
+        stats["alert_emails"] = self.alert_counts["emails"] - emails_before
+        if stats["scraped_asins"]:
+            stats["skip_rate"] = round(stats["unchanged_asins"] / stats["scraped_asins"], 3)
+        stats["elapsed"] = round(time.monotonic() - started, 3)
+        if stats["elapsed"] > 0:
+            stats["products_per_sec"] = round(
+                (stats["checked"] + stats["failed"]) / stats["elapsed"], 2
+            )
+        return stats
+    
+    async def queue_write(self, product: dict, update_data: dict):
+        """Buffer an update to a tracking document until the end of the sweep"""
+        previous = {field: product.get(field) for field in update_data}
+        if product["id"] in self._unconfirmed:
+            # Keep the values from before the first unconfirmed write
+            previous.update(self._unconfirmed[product["id"]][1])
+        self._unconfirmed[product["id"]] = (product, previous)
+        self.write_counts["writes"] += 1
+        await async_firebase_service.buffered_update("products", product["id"], update_data)
+    
+    def dirty_fields(self, product: dict, fresh: dict) -> dict:
+        """The fresh values that differ from the loaded document"""
+        return {field: value for field, value in fresh.items() if product.get(field) != value}
+    
+    async def confirm_writes(self, stats: dict):
+        """Flush buffered writes and roll back the products whose write failed"""
+        failures = await async_firebase_service.flush_writes()
+        for failure in failures:
+            print(f"Error writing product {failure.doc_id}: {failure.error}")
+            stats["write_failures"] += 1
+            entry = self._unconfirmed.get(failure.doc_id)
+            if entry is None:
+                continue
+            product, previous = entry
+            product.update(previous)
+            # Make the next check re-parse the page and write it again
+            if product.get("asin"):
+                self.scraper.fingerprints.discard(product["asin"])
+            self.schedule.retry_later(product)
+        self._unconfirmed.clear()
+    
+    async def wait_for_host(self, deadline: Optional[float]) -> bool:
+        """Sleep until Amazon's breaker lets requests through.
+
+        Returns False, without waiting, once the wait would run past the
+        deadline.
+        """
+        while True:
+            pause = self.scraper.retry_after()
+            if pause <= 0:
+                return True
+            if deadline is not None and time.monotonic() + pause >= deadline:
+                return False
+            # Re-check often so the sweep resumes as soon as a probe succeeds
+            await asyncio.sleep(min(pause, BREAKER_RECHECK_SECONDS))
+    
+    def defer(self, products: List[dict], stats: dict):
+        """Leave products unchecked this run but keep them due"""
+        stats["skipped"] += len(products)
+        for product in products:
+            if product["id"] in self.schedule:
+                self.schedule.add(product)
+    
+    def asin_key(self, product: dict) -> str:
+        return product.get("asin") or product["amazon_url"]
+    
+    def group_by_asin(self, products: List[dict]) -> Dict[str, List[dict]]:
+        """Group tracking documents by the ASIN they point at"""
+        groups: Dict[str, List[dict]] = {}
+        for product in products:
+            groups.setdefault(self.asin_key(product), []).append(product)
+        return groups
     
-    async def check_single_product(self, product: dict):
-        """Check price for a single product"""
+    async def check_asin_group(self, products: List[dict]) -> Optional[Tuple[int, int, bool]]:
+        """Scrape one ASIN and apply the result to every document tracking it.
+
+        Returns (checked, failed, unchanged) where unchanged means the page
+        matched its last fingerprint and nothing had to be written,
+        or None if the circuit breaker refused the request.
+        """
         try:
-            # Scrape current price
-            current_details = self.scraper.scrape_product(product["amazon_url"])
-            current_price = current_details.current_price
-            
-            # Update current price and lowest price
-            update_data = {"current_price": current_price}
+            page_check = await self.scraper.check_for_changes(products[0]["amazon_url"])
+        except Exception as e:
+            if isinstance(e, HTTPException) and e.status_code == 503:
+                # Refused by the circuit breaker, so nothing was checked
+                return None
+            print(f"Error checking ASIN {products[0].get('asin')}: {e}")
+            for product in products:
+                self.schedule.retry_later(product)
+            return 0, len(products), False
+        
+        checked = failed = 0
+        if page_check.product is None:
+            known = self.scraper.fingerprints.get(page_check.asin)
+            known_price = known.price if known is not None else None
+            for product in products:
+                if await self.apply_unchanged(product, known_price):
+                    checked += 1
+                else:
+                    failed += 1
+            return checked, failed, True
+        
+        for product in products:
+            if await self.apply_price_update(
+                product, page_check.product.current_price, page_check.product.availability
+            ):
+                checked += 1
+            else:
+                failed += 1
+        
+        # Only skip this page next time if every tracker got the update
+        if failed == 0 and page_check.fingerprint is not None:
+            self.scraper.fingerprints.record(
+                page_check.asin,
+                page_check.fingerprint._replace(price=page_check.product.current_price)
+            )
+        return checked, failed, False
+    
+    async def apply_price_update(
+        self,
+        product: dict,
+        current_price: float,
+        availability: Optional[str] = None
+    ) -> bool:
+        """Store a freshly scraped price on one tracking document and alert its owner"""
+        try:
+            # Update current price and lowest price, writing only what changed
+            update_data = self.dirty_fields(product, {
+                "current_price": current_price,
+                "lowest_price": min(current_price, product["lowest_price"])
+            })
             
-            if current_price < product["lowest_price"]:
-                update_data["lowest_price"] = current_price
+            if update_data:
+                await self.queue_write(product, update_data)
+            else:
+                self.write_counts["elided"] += 1
             
-            firebase_service.update_document("products", product["id"], update_data)
+            # Schedule the next check before the snapshot takes the new price
+            self.schedule.reschedule(product, current_price, availability)
+            product.update(update_data)
             
             # Check if price dropped to target
             if current_price <= product["target_price"]:
-                await self.trigger_price_alert(product, current_price)
+                self._pending_alerts.append((product, current_price))
+            
+            return True
                 
         except Exception as e:
             print(f"Error checking product {product['id']}: {e}")
+            self.schedule.retry_later(product)
+            return False
     
-    async def trigger_price_alert(self, product: dict, current_price: float):
-        """Trigger price alert and send email"""
+    async def apply_unchanged(self, product: dict, known_price: Optional[float] = None) -> bool:
+        """Handle a tracker whose page has not changed since the last sweep"""
+        # Another tracker of this ASIN took the page's current price after
+        # this document was last written; bring it up to date
+        if known_price is not None and known_price != product["current_price"]:
+            return await self.apply_price_update(product, known_price)
+        
         try:
-            from email_service import send_price_alert_email
+            self.schedule.reschedule(product, product["current_price"])
+            
+            # Nothing to write, but a stored price that already meets the
+            # target (e.g. a product added below its target) still alerts
+            if product["current_price"] <= product["target_price"]:
+                self._pending_alerts.append((product, product["current_price"]))
+            return True
+        except Exception as e:
+            print(f"Error checking product {product['id']}: {e}")
+            self.schedule.retry_later(product)
+            return False
+    
+    async def dispatch_alerts(self) -> int:
+        """Send the queued price alerts, loading their users in bulk"""
+        alerts, self._pending_alerts = self._pending_alerts, []
+        if not alerts:
+            return 0
+        
+        try:
+            users = await user_cache.get_many(product["user_id"] for product, _ in alerts)
+        except Exception as e:
+            print(f"Error loading users for price alerts: {e}")
+            for product, _ in alerts:
+                self.schedule.retry_later(product)
+            return 0
+        
+        by_user: Dict[str, List[Tuple[dict, float]]] = {}
+        for product, current_price in alerts:
+            by_user.setdefault(product["user_id"], []).append((product, current_price))
+        
+        for user_id, user_alerts in by_user.items():
+            user = users.get(user_id)
+            if user is None:
+                continue
+            if ALERT_DIGEST and len(user_alerts) >= ALERT_DIGEST_MIN_PRODUCTS:
+                await self.trigger_price_digest(user_alerts, user)
+                continue
+            for product, current_price in user_alerts:
+                await self.trigger_price_alert(product, current_price, user)
+        self.alert_counts["alerts"] += len(alerts)
+        return len(alerts)
+    
+    def alert_keys(self, product: dict) -> Tuple[str, str]:
+        """Dedup keys of a product's price alert and thank-you mails for today.
+
+        Keyed per product and day, so a repeat trigger (e.g. after a failed
+        deactivation write) doesn't mail the user twice, whether the first
+        mail was a single alert or part of a digest.
+        """
+        suffix = f"{product['id']}:{datetime.now().date().isoformat()}"
+        return f"price_alert:{suffix}", f"thank_you:{suffix}"
+    
+    async def trigger_price_digest(self, alerts: List[Tuple[dict, float]], user: dict):
+        """Send one email for all of a user's alerts in this sweep and deactivate them"""
+        try:
+            from email_service import send_price_digest_email
             
-            # Get user details
-            users = firebase_service.query_documents("users", "uid", "==", product["user_id"])
-            if not users:
+            # Products already mailed today are left out and only deactivated
+            mailed = email_service.used_keys(self.alert_keys(product)[0] for product, _ in alerts)
+            fresh = [
+                (product, current_price) for product, current_price in alerts
+                if self.alert_keys(product)[0] not in mailed
+            ]
+            if len(fresh) < ALERT_DIGEST_MIN_PRODUCTS:
+                # Too few left for a digest; single alerts skip the mailed ones
+                for product, current_price in alerts:
+                    await self.trigger_price_alert(product, current_price, user)
                 return
             
-            user = users[0]
+            products = [
+                {
+                    "product_name": product["product_name"],
+                    "current_price": current_price,
+                    "target_price": product["target_price"],
+                    "lowest_price": product["lowest_price"],
+                    "image_url": product["image_url"],
+                    "amazon_url": product["amazon_url"]
+                }
+                for product, current_price in fresh
+            ]
+            # The digest stands in for each product's alert and thank-you
+            covers = [key for product, _ in fresh for key in self.alert_keys(product)]
+            if await send_price_digest_email(user["email"], user["name"], products, covers):
+                self.alert_counts["emails"] += 1
+            
+            for product, _ in alerts:
+                await self.queue_write(product, {"is_active": False})
+                product["is_active"] = False
+                self.schedule.remove(product["id"])
+            
+        except Exception as e:
+            print(f"Error triggering price digest: {e}")
+    
+    async def trigger_price_alert(self, product: dict, current_price: float, user: dict):
+        """Trigger price alert and send email"""
+        try:
+            from email_service import send_price_alert_email
+            
+            alert_key, thank_you_key = self.alert_keys(product)
             
             # Send price alert email
-            await send_price_alert_email(
+            if await send_price_alert_email(
                 user["email"],
                 user["name"],
                 product["product_name"],
@@ -265,14 +590,22 @@ class PriceChecker:
                 product["target_price"],
                 product["lowest_price"],
                 product["image_url"],
-                product["amazon_url"]
-            )
+                product["amazon_url"],
+                dedup_key=alert_key
+            ):
+                self.alert_counts["emails"] += 1
             
             # Deactivate product and send thank you email
-            firebase_service.update_document("products", product["id"], {"is_active": False})
+            await self.queue_write(product, {"is_active": False})
+            product["is_active"] = False
+            self.schedule.remove(product["id"])
             
             from email_service import send_thank_you_email
-            await send_thank_you_email(user["email"], user["name"], product["product_name"])
+            if await send_thank_you_email(
+                user["email"], user["name"], product["product_name"],
+                dedup_key=thank_you_key
+            ):
+                self.alert_counts["emails"] += 1
             
         except Exception as e:
             print(f"Error triggering price alert: {e}")
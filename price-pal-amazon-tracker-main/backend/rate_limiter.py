@@ -0,0 +1,206 @@
+from typing import Dict
+import asyncio
+import os
+import random
+import time
+
+# Rate limiter configuration (per target host)
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "2"))
+RATE_LIMIT_MIN_RPS = float(os.getenv("RATE_LIMIT_MIN_RPS", "0.1"))
+RATE_LIMIT_MAX_RPS = float(os.getenv("RATE_LIMIT_MAX_RPS", "5"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "5"))
+# Circuit breaker: open after this many consecutive throttled/failed requests
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "300"))
+# How long callers wait on a half-open breaker's probe before another is allowed
+BREAKER_PROBE_TIMEOUT = float(os.getenv("BREAKER_PROBE_TIMEOUT", "30"))
+# Retry with jittered exponential backoff
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+
+class ThrottledError(Exception):
+    """The host answered with a throttling status or a captcha page"""
+
+class CircuitOpenError(Exception):
+    """Requests to the host are paused until the breaker cools down"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"Circuit open for {host}, retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+def backoff_delay(
+    attempt: int,
+    base: float = RETRY_BASE_DELAY,
+    cap: float = RETRY_MAX_DELAY
+) -> float:
+    """Full-jitter exponential backoff for the given zero-based attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+        probe_timeout: float = BREAKER_PROBE_TIMEOUT
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.trial_started_at = 0.0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def _probe_remaining(self) -> float:
+        return self.probe_timeout - (time.monotonic() - self.trial_started_at)
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker may let requests through.
+
+        While a half-open probe is in flight everyone else is still refused,
+        so callers are told to wait for the probe rather than 0.
+        """
+        if self.opened_at is None:
+            return 0.0
+        remaining = self.cooldown - (time.monotonic() - self.opened_at)
+        if remaining > 0:
+            return remaining
+        if self.trial_in_flight:
+            return max(0.0, self._probe_remaining())
+        return 0.0
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and (not self.trial_in_flight or self._probe_remaining() <= 0):
+            # Let a single probe through to see whether the host recovered;
+            # a probe that never reported back is replaced after its timeout
+            self.trial_in_flight = True
+            self.trial_started_at = time.monotonic()
+            return True
+        return False
+
+    def release_trial(self):
+        """Give up a probe that ended without telling us anything about the host"""
+        self.trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+class HostThrottle:
+    """Adaptive token bucket plus circuit breaker for one host.
+
+    The request rate grows additively while responses are clean and is
+    halved whenever the host throttles us or serves a captcha.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RPS,
+        min_rate: float = RATE_LIMIT_MIN_RPS,
+        max_rate: float = RATE_LIMIT_MAX_RPS,
+        burst: float = RATE_LIMIT_BURST
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    async def acquire(self):
+        await self.bucket.acquire()
+        self.requests += 1
+
+    def record_success(self):
+        self.breaker.record_success()
+        # Additive increase: one extra request/sec every ~10 clean responses
+        self.bucket.rate = min(self.max_rate, self.bucket.rate + 0.1)
+
+    def record_failure(self, throttled: bool):
+        self.breaker.record_failure()
+        if throttled:
+            self.throttled += 1
+            # Multiplicative decrease when the host pushes back
+            self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+        else:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {
+            "rate": round(self.bucket.rate, 3),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "retry_after": round(self.breaker.retry_after(), 1)
+        }
+
+class RateLimiter:
+    """Per-host registry of adaptive throttles"""
+
+    def __init__(self):
+        self._hosts: Dict[str, HostThrottle] = {}
+
+    def for_host(self, host: str) -> HostThrottle:
+        throttle = self._hosts.get(host)
+        if throttle is None:
+            throttle = self._hosts[host] = HostThrottle()
+        return throttle
+
+    def retry_after(self, host: str) -> float:
+        """Seconds callers should wait before sending work to host"""
+        throttle = self._hosts.get(host)
+        return throttle.breaker.retry_after() if throttle else 0.0
+
+    def stats(self) -> dict:
+        return {host: throttle.stats() for host, throttle in self._hosts.items()}
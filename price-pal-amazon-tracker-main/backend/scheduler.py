@@ -2,9 +2,14 @@
 import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from coordination import LEASE_TTL_SECONDS, coordinator
+from datetime import datetime
+from polling import POLL_TICK_MINUTES
 from price_checker import price_checker
-from firebase_config import firebase_service
-from email_service import send_weekly_reminder_email
+from token_cache import TOKEN_KEY_REFRESH_MINUTES, prefetch_signing_keys
+from firebase_config import async_firebase_service, run_blocking
+from email_service import send_weekly_reminder_emails
 import logging
 
 # Configure logging
@@ -13,26 +18,82 @@ logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
 
-async def check_all_prices():
-    """Scheduled task to check all product prices"""
-    logger.info("Starting scheduled price check...")
+# Users rendered and queued together by the weekly reminder job
+REMINDER_BATCH_SIZE = 500
+
+# Weekly reminders are claimed for longer than any replica could take to send them
+REMINDER_CLAIM_SECONDS = 6 * 24 * 3600
+# Minutes past 10 AM the reminder job retries, in case no replica held the
+# leader lease at the first attempt
+REMINDER_RETRY_MINUTES = '0,15,30,45'
+
+async def coordination_heartbeat():
+    """Renew this replica's leases and rebalance sweep shards"""
+    try:
+        previous = coordinator.owned_shards()
+        await coordinator.heartbeat()
+        owned = coordinator.owned_shards()
+        if owned != previous:
+            logger.info(
+                f"Now owning {len(owned)}/{coordinator.shards} sweep shards "
+                f"({coordinator.live_workers} live workers, leader={coordinator.is_leader})"
+            )
+    except Exception as e:
+        logger.error(f"Error renewing coordination leases: {e}")
+
+async def check_due_prices():
+    """Scheduled task to check the products that are due for a price check"""
     try:
-        await price_checker.check_all_products()
-        logger.info("Completed scheduled price check")
+        stats = await price_checker.check_due_products()
+        if stats is None:
+            logger.warning("Previous price check still running, skipping this tick")
+            return
+        schedule = stats["schedule"]
+        if not stats["total"] and not schedule["backlog"]:
+            return
+        logger.info(
+            f"Completed price check: {stats['checked']} checked, "
+            f"{stats['failed']} failed, {stats['skipped']} skipped of {stats['total']} due "
+            f"({stats['unique_asins']} unique ASINs, {stats['skip_rate']:.0%} unchanged), "
+            f"{stats['writes']} writes ({stats['writes_elided']} elided, "
+            f"{stats['write_failures']} failed), "
+            f"{stats['alerts']} alerts ({stats['alert_emails']} emails) "
+            f"in {stats['elapsed']:.1f}s ({stats['products_per_sec']:.2f} products/sec); "
+            f"{schedule['tracked']} scheduled, backlog {schedule['backlog']}, "
+            f"lag {schedule['lag']:.0f}s"
+        )
     except Exception as e:
         logger.error(f"Error in scheduled price check: {e}")
 
+async def refresh_signing_keys():
+    """Keep the ID token signing keys cached so requests never fetch them"""
+    await run_blocking(prefetch_signing_keys)
+
 async def send_weekly_reminders():
     """Send weekly reminders to all users"""
-    logger.info("Sending weekly reminders...")
     try:
-        # Get all users
-        users_collection = firebase_service.get_collection("users")
-        users = users_collection.stream()
+        # Every replica fires this job but only the leader sends; the weekly
+        # claim keeps a leader that changes mid-morning from sending twice
+        if not coordinator.is_leader:
+            return
+        year, week, _ = datetime.now().isocalendar()
+        claimed = await coordinator.claim_once(
+            f"weekly_reminders:{year}-W{week:02d}", REMINDER_CLAIM_SECONDS
+        )
+        if not claimed:
+            return
         
-        for user_doc in users:
-            user_data = user_doc.to_dict()
-            await send_weekly_reminder_email(user_data["email"], user_data["name"])
+        logger.info("Sending weekly reminders...")
+        # Page through the users, rendering and queueing a batch at a time
+        dedup_prefix = f"weekly_reminder:{year}-W{week:02d}"
+        batch = []
+        async for user_data in async_firebase_service.stream_documents("users"):
+            batch.append(user_data)
+            if len(batch) >= REMINDER_BATCH_SIZE:
+                await send_weekly_reminder_emails(batch, dedup_prefix)
+                batch = []
+        if batch:
+            await send_weekly_reminder_emails(batch, dedup_prefix)
         
         logger.info("Completed sending weekly reminders")
     except Exception as e:
@@ -41,19 +102,49 @@ async def send_weekly_reminders():
 def start_scheduler():
     """Start the scheduler with all tasks"""
     try:
-        # Check prices 6 times a day (0, 4, 8, 12, 16, 20 IST)
+        # Hold leases before the first sweep so shards are split up front
         scheduler.add_job(
-            check_all_prices,
-            CronTrigger(hour='0,4,8,12,16,20', minute=0, timezone='Asia/Kolkata'),
+            coordination_heartbeat,
+            IntervalTrigger(seconds=LEASE_TTL_SECONDS / 3),
+            id='coordination_heartbeat',
+            name='Renew coordination leases',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now()
+        )
+        
+        # Fetch token signing keys now and keep them fresh
+        scheduler.add_job(
+            refresh_signing_keys,
+            IntervalTrigger(minutes=TOKEN_KEY_REFRESH_MINUTES),
+            id='refresh_signing_keys',
+            name='Refresh token signing keys',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now()
+        )
+        
+        # Check whichever products are due; each product's next check time
+        # adapts to how close it is to its target price
+        scheduler.add_job(
+            check_due_prices,
+            IntervalTrigger(minutes=POLL_TICK_MINUTES),
             id='price_check',
             name='Check product prices',
-            replace_existing=True
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
         )
         
         # Send weekly reminders every Sunday at 10 AM IST
         scheduler.add_job(
             send_weekly_reminders,
-            CronTrigger(day_of_week='sun', hour=10, minute=0, timezone='Asia/Kolkata'),
+            CronTrigger(
+                day_of_week='sun', hour=10, minute=REMINDER_RETRY_MINUTES,
+                timezone='Asia/Kolkata'
+            ),
             id='weekly_reminders',
             name='Send weekly reminders',
             replace_existing=True
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from models import ProductResponse
+from typing import Dict, Optional, Tuple
+import math
+import os
+import time
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional, only needed for a shared cache
+    aioredis = None
+
+# Scrape cache configuration
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "300"))
+SCRAPE_CACHE_SIZE = int(os.getenv("SCRAPE_CACHE_SIZE", "1024"))
+# Point every worker at the same Redis to share hits; empty keeps it in-process,
+# and "local" uses the in-process stand-in for the shared tier
+SCRAPE_CACHE_REDIS_URL = os.getenv("SCRAPE_CACHE_REDIS_URL", "")
+
+class LocalCacheBackend:
+    """In-process stand-in for the shared Redis backend"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, str]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    async def close(self):
+        self._data.clear()
+
+class RedisCacheBackend:
+    """Shared cache backend for any Redis-compatible server"""
+
+    def __init__(self, url: str):
+        if aioredis is None:
+            raise RuntimeError("The redis package is required for SCRAPE_CACHE_REDIS_URL")
+        self._client = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._client.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._client.set(key, value, ex=max(1, math.ceil(ttl)))
+
+    async def close(self):
+        await self._client.close()
+
+class ScrapeCache:
+    """TTL + LRU cache of scraped products keyed by ASIN"""
+
+    def __init__(
+        self,
+        ttl: float = SCRAPE_CACHE_TTL,
+        max_size: int = SCRAPE_CACHE_SIZE,
+        backend=None
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.backend = backend
+        self._entries: "OrderedDict[str, Tuple[float, ProductResponse]]" = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(asin: str) -> str:
+        return f"scrape:{asin.strip().upper()}"
+
+    async def get(self, asin: str) -> Optional[ProductResponse]:
+        """Return a fresh cached product for an ASIN, if any"""
+        key = self._key(asin)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, product = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return product.model_copy()
+            del self._entries[key]
+
+        if self.backend is not None:
+            try:
+                value = await self.backend.get(key)
+            except Exception as e:
+                print(f"Error reading shared scrape cache: {e}")
+                value = None
+            if value:
+                product = ProductResponse.model_validate_json(value)
+                self._store(key, product)
+                self.shared_hits += 1
+                return product.model_copy()
+
+        self.misses += 1
+        return None
+
+    async def set(self, asin: str, product: ProductResponse):
+        """Cache a freshly scraped product"""
+        key = self._key(asin)
+        self._store(key, product)
+
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, product.model_dump_json(), self.ttl)
+            except Exception as e:
+                print(f"Error writing shared scrape cache: {e}")
+
+    def _store(self, key: str, product: ProductResponse):
+        self._entries[key] = (time.monotonic() + self.ttl, product)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.shared_hits) / lookups, 3) if lookups else 0.0
+        }
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+def create_scrape_cache() -> ScrapeCache:
+    """Build the scrape cache from environment configuration"""
+    if SCRAPE_CACHE_REDIS_URL == "local":
+        backend = LocalCacheBackend()
+    elif SCRAPE_CACHE_REDIS_URL:
+        backend = RedisCacheBackend(SCRAPE_CACHE_REDIS_URL)
+    else:
+        backend = None
+    return ScrapeCache(backend=backend)
@@ -0,0 +1,435 @@
+import aiohttp
+import asyncio
+from extractor import SCRAPER_EXTRACTOR, FastScanner, ParsePool, ProductFields
+from fastapi import HTTPException
+from fingerprints import FingerprintStore, PageFingerprint, fields_digest
+from models import ProductResponse
+from rate_limiter import (
+    RETRY_ATTEMPTS, CircuitOpenError, RateLimiter, ThrottledError, backoff_delay
+)
+from scrape_cache import ScrapeCache, create_scrape_cache
+from single_flight import SingleFlight
+from collections import deque
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+import os
+import re
+import zlib
+
+# Scraper configuration
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "10"))
+SCRAPER_CONNECT_TIMEOUT = float(os.getenv("SCRAPER_CONNECT_TIMEOUT", "5"))
+SCRAPER_MAX_CONNECTIONS = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "100"))
+SCRAPER_LIMIT_PER_HOST = int(os.getenv("SCRAPER_LIMIT_PER_HOST", "10"))
+SCRAPER_KEEPALIVE_TIMEOUT = float(os.getenv("SCRAPER_KEEPALIVE_TIMEOUT", "30"))
+# Streaming mode stops downloading once the needed fields are in, at the cost
+# of closing that connection instead of returning it to the pool
+SCRAPER_STREAMING = os.getenv("SCRAPER_STREAMING", "false").lower() == "true"
+SCRAPER_STREAM_CHUNK_SIZE = int(os.getenv("SCRAPER_STREAM_CHUNK_SIZE", "16384"))
+# Per-fetch streaming samples kept for the stats
+SCRAPER_STREAM_SAMPLES = 50
+
+AMAZON_HOST = "www.amazon.in"
+# Statuses Amazon uses to push back on scrapers
+THROTTLE_STATUSES = {429, 503}
+CAPTCHA_MARKERS = (b'/errors/validateCaptcha', b'Type the characters you see in this image')
+
+class FetchResult(NamedTuple):
+    content: bytes
+    fields: Optional[ProductFields]
+    fingerprint: PageFingerprint
+    not_modified: bool = False
+    # Bytes left undownloaded by a streaming fetch; None if the size was unknown
+    bytes_saved: Optional[int] = None
+
+class BodyDecoder:
+    """Undo the Content-Encoding ourselves, so the bytes read off the wire
+    can be counted against Content-Length"""
+
+    def __init__(self, encoding: Optional[str]):
+        encoding = (encoding or "identity").lower()
+        if encoding in ("gzip", "x-gzip"):
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "identity":
+            self._zlib = None
+        else:
+            raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+    def decode(self, chunk: bytes) -> bytes:
+        return self._zlib.decompress(chunk) if self._zlib else chunk
+
+    def flush(self) -> bytes:
+        return self._zlib.flush() if self._zlib else b""
+
+class PageCheck(NamedTuple):
+    """Outcome of a sweep check; product is None when the page is unchanged"""
+    asin: str
+    product: Optional[ProductResponse]
+    fingerprint: Optional[PageFingerprint]
+
+class AmazonScraper:
+    def __init__(
+        self,
+        timeout: float = SCRAPER_TIMEOUT,
+        connect_timeout: float = SCRAPER_CONNECT_TIMEOUT,
+        max_connections: int = SCRAPER_MAX_CONNECTIONS,
+        limit_per_host: int = SCRAPER_LIMIT_PER_HOST,
+        keepalive_timeout: float = SCRAPER_KEEPALIVE_TIMEOUT,
+        extractor: str = SCRAPER_EXTRACTOR,
+        cache: Optional[ScrapeCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_attempts: int = RETRY_ATTEMPTS,
+        parse_pool: Optional[ParsePool] = None,
+        streaming: bool = SCRAPER_STREAMING
+    ):
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36',
+            'Accept-Language': 'en-US,en;q=0.9',
+            # Bodies are decoded by BodyDecoder, which only knows gzip
+            'Accept-Encoding': 'gzip'
+        }
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.parse_pool = parse_pool if parse_pool is not None else ParsePool(engine=extractor)
+        self.cache = cache if cache is not None else create_scrape_cache()
+        self.flights = SingleFlight()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.retry_attempts = retry_attempts
+        self.streaming = streaming
+        self.stream_stats = {
+            "fetches": 0,
+            "early_stops": 0,
+            "bytes_read": 0,
+            "wire_bytes": 0,
+            "bytes_saved": 0,
+            # Fetches whose full size was known, so bytes_saved covers them
+            "sized_fetches": 0
+        }
+        self._stream_samples: deque = deque(maxlen=SCRAPER_STREAM_SAMPLES)
+        self.fingerprints = FingerprintStore()
+        self.change_stats = {"checks": 0, "not_modified": 0, "unchanged": 0}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared keep-alive session, creating it on first use"""
+        # The session binds to the running event loop, so it is created lazily
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                auto_decompress=False,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.timeout,
+                    sock_connect=self.connect_timeout
+                )
+            )
+        return self._session
+
+    async def close(self):
+        """Close the pooled HTTP session, the shared cache and the parse pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        await self.cache.close()
+        self.parse_pool.shutdown()
+
+    def stats(self) -> dict:
+        """Return cache and coalescing counters for monitoring"""
+        return {
+            "cache": self.cache.stats(),
+            "single_flight": self.flights.stats(),
+            "hosts": self.rate_limiter.stats(),
+            "streaming": {**self.stream_stats, "recent": list(self._stream_samples)},
+            "change_detection": self.change_stats
+        }
+
+    def retry_after(self, host: str = AMAZON_HOST) -> float:
+        """Seconds until the circuit breaker lets requests to host through"""
+        return self.rate_limiter.retry_after(host)
+
+    def extract_asin(self, url: str) -> str:
+        """Extract ASIN from Amazon URL"""
+        patterns = [
+            r'/dp/([A-Z0-9]{10})',
+            r'/product/([A-Z0-9]{10})',
+            r'asin=([A-Z0-9]{10})',
+            r'/([A-Z0-9]{10})'
+        ]
+
+        for pattern in patterns:
+            match = re.search(pattern, url)
+            if match:
+                return match.group(1)
+
+        raise ValueError("Could not extract ASIN from URL")
+
+    async def fetch_page(self, url: str) -> bytes:
+        """Download a page over the pooled session"""
+        result = await self._fetch(url, stream=False)
+        return result.content
+
+    async def _fetch(
+        self,
+        url: str,
+        stream: bool,
+        headers: Optional[Dict[str, str]] = None
+    ) -> FetchResult:
+        """Fetch a page, optionally streaming it through the fast-path scanner.
+
+        Requests are paced by the per-host rate limiter; throttling
+        responses and network errors are retried with jittered backoff
+        until the host's circuit breaker opens.
+        """
+        host = urlsplit(url).hostname or ""
+        throttle = self.rate_limiter.for_host(host)
+
+        for attempt in range(self.retry_attempts + 1):
+            if not throttle.breaker.allow():
+                raise CircuitOpenError(host, throttle.breaker.retry_after())
+            probing = throttle.breaker.trial_in_flight
+            try:
+                await throttle.acquire()
+                if stream:
+                    result = await self._get_streaming(url, headers)
+                else:
+                    result = await self._get(url, headers)
+            except aiohttp.ClientResponseError:
+                # A regular HTTP error (e.g. 404) means the host is answering
+                throttle.record_success()
+                raise
+            except (ThrottledError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                throttle.record_failure(throttled=isinstance(e, ThrottledError))
+                if attempt == self.retry_attempts:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            except BaseException:
+                # Cancelled, or failed in a way that says nothing about the
+                # host; don't leave a half-open breaker waiting on this probe
+                if probing:
+                    throttle.breaker.release_trial()
+                raise
+
+            throttle.record_success()
+            return result
+
+    def _check_response(self, response: aiohttp.ClientResponse):
+        if response.status in THROTTLE_STATUSES:
+            raise ThrottledError(f"{response.status} from {response.url.host}")
+        response.raise_for_status()
+
+    def _check_captcha(self, content: bytes, host: str):
+        if any(marker in content for marker in CAPTCHA_MARKERS):
+            raise ThrottledError(f"Captcha page from {host}")
+
+    def _validators(self, response: aiohttp.ClientResponse) -> PageFingerprint:
+        return PageFingerprint(
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            digest=None
+        )
+
+    async def _get(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        session = self._get_session()
+        async with session.get(url, headers=headers) as response:
+            self._check_response(response)
+            validators = self._validators(response)
+            if response.status == 304:
+                return FetchResult(b"", None, validators, not_modified=True)
+            decoder = BodyDecoder(response.headers.get("Content-Encoding"))
+            raw = await response.read()
+            content = decoder.decode(raw) + decoder.flush()
+
+        self._check_captcha(content, response.url.host)
+        return FetchResult(content, None, validators)
+
+    async def _get_streaming(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        """Read the page chunk by chunk and hang up once every field is captured"""
+        session = self._get_session()
+        scanner = FastScanner()
+        wire_bytes = 0
+        stopped_early = False
+
+        async with session.get(url, headers=headers) as response:
+            self._check_response(response)
+            validators = self._validators(response)
+            if response.status == 304:
+                return FetchResult(b"", None, validators, not_modified=True)
+            decoder = BodyDecoder(response.headers.get("Content-Encoding"))
+            # Content-Length is the encoded size, the same unit as wire_bytes
+            total = response.content_length
+
+            async for chunk in response.content.iter_chunked(SCRAPER_STREAM_CHUNK_SIZE):
+                wire_bytes += len(chunk)
+                if scanner.feed(decoder.decode(chunk)):
+                    stopped_early = True
+                    break
+
+            if stopped_early:
+                # Drop the connection instead of draining the rest of the page
+                response.close()
+            else:
+                scanner.feed(decoder.flush())
+
+        bytes_saved = max(0, total - wire_bytes) if total is not None else None
+        self._record_stream(url, wire_bytes, len(scanner.buffer), bytes_saved, stopped_early)
+        content = bytes(scanner.buffer)
+        if stopped_early:
+            return FetchResult(content, scanner.result(), validators, bytes_saved=bytes_saved)
+
+        self._check_captcha(content, response.url.host)
+        return FetchResult(content, scanner.finish(), validators, bytes_saved=bytes_saved)
+
+    def _record_stream(
+        self,
+        url: str,
+        wire_bytes: int,
+        bytes_read: int,
+        bytes_saved: Optional[int],
+        stopped_early: bool
+    ):
+        stats = self.stream_stats
+        stats["fetches"] += 1
+        stats["early_stops"] += stopped_early
+        stats["bytes_read"] += bytes_read
+        stats["wire_bytes"] += wire_bytes
+        if bytes_saved is not None:
+            stats["bytes_saved"] += bytes_saved
+            stats["sized_fetches"] += 1
+        self._stream_samples.append({
+            "url": url,
+            "wire_bytes": wire_bytes,
+            "bytes_read": bytes_read,
+            "bytes_saved": bytes_saved,
+            "stopped_early": stopped_early
+        })
+
+    async def scrape_product(self, url: str, use_cache: bool = True) -> ProductResponse:
+        """Scrape product details from Amazon.
+
+        Recent results are served from the ASIN cache unless use_cache is
+        False; a live scrape always refreshes the cache. Concurrent live
+        scrapes and sweep checks of the same ASIN share a single fetch.
+        """
+        try:
+            asin = self.extract_asin(url)
+
+            if use_cache:
+                cached = await self.cache.get(asin)
+                if cached is not None:
+                    return cached
+
+            check = await self.flights.do(asin, lambda: self._scrape_live(asin))
+            if check.product is None:
+                # Joined a sweep check that found the page unchanged
+                check = await self.flights.do(asin, lambda: self._scrape_live(asin))
+            return check.product.model_copy()
+
+        except CircuitOpenError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Amazon is rate limiting requests, try again in {e.retry_after:.0f}s"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Error scraping product: {str(e)}"
+            )
+
+    async def _scrape_live(self, asin: str) -> PageCheck:
+        # Clean URL
+        clean_url = f"https://{AMAZON_HOST}/dp/{asin}"
+
+        result = await self._with_fields(await self._fetch(clean_url, stream=self.streaming))
+        product = await self._product_from(result, asin, clean_url)
+        return PageCheck(asin, product, result.fingerprint)
+
+    async def _with_fields(self, result: FetchResult) -> FetchResult:
+        """Extract the page's fields if the fetch didn't, and fingerprint them"""
+        fields = result.fields
+        if fields is None:
+            fields = await self.parse_pool.extract(result.content)
+        fingerprint = result.fingerprint._replace(digest=fields_digest(fields))
+        return result._replace(fields=fields, fingerprint=fingerprint)
+
+    async def _product_from(self, result: FetchResult, asin: str, clean_url: str) -> ProductResponse:
+        product = self.build_product(result.fields, asin, clean_url)
+        await self.cache.set(asin, product)
+        return product
+
+    async def check_for_changes(self, url: str) -> PageCheck:
+        """Scrape a product for the price sweep, short-circuiting unchanged pages.
+
+        The page is requested with the validators from the last recorded
+        fingerprint, and a 304 or an identical hash of the extracted fields
+        skips the update; the recorded fingerprint then holds the current price.
+        Callers record the returned fingerprint once they have acted on the
+        product, so a failed update is retried next sweep. A live scrape of
+        the same ASIN already under way is joined instead of fetched again.
+        """
+        try:
+            asin = self.extract_asin(url)
+            check = await self.flights.do(asin, lambda: self._check_live(asin))
+            if check.product is None:
+                return check
+            return check._replace(product=check.product.model_copy())
+
+        except CircuitOpenError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Amazon is rate limiting requests, try again in {e.retry_after:.0f}s"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Error scraping product: {str(e)}"
+            )
+
+    async def _check_live(self, asin: str) -> PageCheck:
+        clean_url = f"https://{AMAZON_HOST}/dp/{asin}"
+        self.change_stats["checks"] += 1
+
+        result = await self._fetch(
+            clean_url,
+            stream=self.streaming,
+            headers=self.fingerprints.conditional_headers(asin)
+        )
+        if result.not_modified:
+            self.change_stats["not_modified"] += 1
+            return PageCheck(asin, None, None)
+        result = await self._with_fields(result)
+        if self.fingerprints.is_unchanged(asin, result.fingerprint):
+            # Same content, but keep any fresh validators for a 304 next time
+            previous = self.fingerprints.get(asin)
+            self.fingerprints.record(asin, result.fingerprint._replace(price=previous.price))
+            self.change_stats["unchanged"] += 1
+            return PageCheck(asin, None, None)
+
+        product = await self._product_from(result, asin, clean_url)
+        return PageCheck(asin, product, result.fingerprint)
+
+    async def parse_product(self, content: bytes, asin: str, clean_url: str) -> ProductResponse:
+        """Parse product details out of a downloaded product page"""
+        fields = await self.parse_pool.extract(content)
+        return self.build_product(fields, asin, clean_url)
+
+    def build_product(self, fields: ProductFields, asin: str, clean_url: str) -> ProductResponse:
+        return ProductResponse(
+            product_name=fields.product_name,
+            current_price=fields.current_price,
+            image_url=fields.image_url,
+            asin=asin,
+            amazon_url=clean_url,
+            availability=fields.availability
+        )
+
+scraper = AmazonScraper()
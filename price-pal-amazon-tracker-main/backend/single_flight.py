@@ -0,0 +1,41 @@
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key onto one in-flight task"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or wait for the call already running for it"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # Shield so one cancelled waiter does not cancel everyone's fetch
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = future
+        self.executed += 1
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Mark the error as retrieved in case every waiter was cancelled
+        if not future.cancelled():
+            future.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight)
+        }
@@ -0,0 +1,159 @@
+from collections import deque
+from email.message import Message
+from typing import List, Optional
+import aiosmtplib
+import asyncio
+import os
+import time
+
+# SMTP pool configuration
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Connections idle longer than this are checked with NOOP before reuse
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30"))
+# Providers cap messages per session, so connections are recycled before that
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+# Latency samples kept for the percentile metrics
+SMTP_LATENCY_WINDOW = 1000
+
+# Errors that mean the connection itself is gone, so the send is retried once
+CONNECTION_ERRORS = (OSError, asyncio.TimeoutError, aiosmtplib.SMTPTimeoutError)
+
+class PooledConnection:
+    __slots__ = ("smtp", "last_used", "messages")
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+class SMTPConnectionPool:
+    """A few authenticated SMTP sessions reused across messages.
+
+    At most `size` messages are in flight at once. Idle sessions are health
+    checked before reuse, and a send that fails because its session dropped
+    is retried once on a fresh connection.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str,
+        password: str,
+        size: int = SMTP_POOL_SIZE,
+        timeout: float = SMTP_TIMEOUT,
+        idle_check: float = SMTP_IDLE_CHECK_SECONDS,
+        max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self.max_messages = max_messages
+        self._idle: List[PooledConnection] = []
+        self._slots = asyncio.Semaphore(size)
+        self._latencies: deque = deque(maxlen=SMTP_LATENCY_WINDOW)
+        self.counters = {
+            "sent": 0,
+            "failed": 0,
+            "connects": 0,
+            "reconnects": 0,
+            "health_check_failures": 0
+        }
+
+    async def send(self, message: Message):
+        """Send a message over a pooled connection, raising on failure"""
+        started = time.monotonic()
+        async with self._slots:
+            try:
+                await self._send(message)
+            except Exception:
+                self.counters["failed"] += 1
+                raise
+        self.counters["sent"] += 1
+        self._latencies.append(time.monotonic() - started)
+
+    async def _send(self, message: Message):
+        conn = await self._acquire()
+        try:
+            await conn.smtp.send_message(message)
+        except CONNECTION_ERRORS:
+            # The session died under us; one more try on a new connection
+            await self._discard(conn)
+            self.counters["reconnects"] += 1
+            conn = await self._connect()
+            try:
+                await conn.smtp.send_message(message)
+            except Exception:
+                await self._release(conn)
+                raise
+        except Exception:
+            await self._release(conn)
+            raise
+        conn.messages += 1
+        await self._release(conn)
+
+    async def _acquire(self) -> PooledConnection:
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.smtp.is_connected:
+                continue
+            if time.monotonic() - conn.last_used < self.idle_check:
+                return conn
+            try:
+                await conn.smtp.noop()
+                return conn
+            except Exception:
+                self.counters["health_check_failures"] += 1
+                await self._discard(conn)
+        return await self._connect()
+
+    async def _connect(self) -> PooledConnection:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            timeout=self.timeout,
+            start_tls=True
+        )
+        await smtp.connect()
+        await smtp.login(self.username, self.password)
+        self.counters["connects"] += 1
+        return PooledConnection(smtp)
+
+    async def _release(self, conn: PooledConnection):
+        if not conn.smtp.is_connected or conn.messages >= self.max_messages:
+            await self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        self._idle.append(conn)
+
+    async def _discard(self, conn: PooledConnection):
+        try:
+            if conn.smtp.is_connected:
+                await conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._discard(conn)
+
+    def _percentile(self, samples: List[float], fraction: float) -> Optional[float]:
+        if not samples:
+            return None
+        return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 3)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            **self.counters,
+            "idle_connections": len(self._idle),
+            "latency_p50": self._percentile(latencies, 0.5),
+            "latency_p95": self._percentile(latencies, 0.95),
+            "latency_max": round(latencies[-1], 3) if latencies else None
+        }
@@ -0,0 +1,47 @@
+from models import ProductResponse
+from scrape_cache import LocalCacheBackend, ScrapeCache
+import asyncio
+import scrape_cache
+
+PRODUCT = ProductResponse(
+    product_name="Wireless Earbuds",
+    current_price=1299.0,
+    image_url="https://m.media-amazon.com/images/I/earbuds.jpg",
+    asin="B0ABCD1234",
+    amazon_url="https://www.amazon.in/dp/B0ABCD1234"
+)
+
+def test_shared_tier_serves_other_workers():
+    async def run():
+        # Two workers pointed at the same shared tier
+        shared = LocalCacheBackend()
+        first = ScrapeCache(backend=shared)
+        second = ScrapeCache(backend=shared)
+
+        await first.set(PRODUCT.asin, PRODUCT)
+        assert await second.get(PRODUCT.asin) == PRODUCT
+        assert second.stats()["shared_hits"] == 1
+
+        # The shared hit is now held locally too
+        assert await second.get(PRODUCT.asin) == PRODUCT
+        stats = second.stats()
+        assert (stats["hits"], stats["shared_hits"], stats["misses"]) == (1, 1, 0)
+
+    asyncio.run(run())
+
+def test_shared_entries_expire():
+    async def run():
+        shared = LocalCacheBackend()
+        await ScrapeCache(ttl=0.05, backend=shared).set(PRODUCT.asin, PRODUCT)
+        await asyncio.sleep(0.1)
+        reader = ScrapeCache(backend=shared)
+        assert await reader.get(PRODUCT.asin) is None
+        assert reader.stats()["misses"] == 1
+
+    asyncio.run(run())
+
+def test_local_shared_tier_is_selectable(monkeypatch):
+    monkeypatch.setattr(scrape_cache, "SCRAPE_CACHE_REDIS_URL", "local")
+    assert isinstance(scrape_cache.create_scrape_cache().backend, LocalCacheBackend)
+    monkeypatch.setattr(scrape_cache, "SCRAPE_CACHE_REDIS_URL", "")
+    assert scrape_cache.create_scrape_cache().backend is None
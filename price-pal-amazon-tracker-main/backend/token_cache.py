@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from firebase_admin import auth as firebase_auth
+from typing import Callable, Optional, Tuple
+import hashlib
+import os
+import time
+
+# Token cache configuration
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# A verified token is trusted for at most this long before being verified
+# again, so revoked tokens and disabled accounts stop working within it
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "300"))
+# Also ask Firebase whether the token was revoked (one extra lookup per verify)
+AUTH_CHECK_REVOKED = os.getenv("AUTH_CHECK_REVOKED", "false").lower() == "true"
+# How often the ID token signing keys are refreshed in the background
+TOKEN_KEY_REFRESH_MINUTES = float(os.getenv("TOKEN_KEY_REFRESH_MINUTES", "60"))
+
+def token_key(id_token: str) -> str:
+    # Raw bearer tokens are never kept in memory longer than the request
+    return hashlib.sha256(id_token.encode()).hexdigest()
+
+class TokenCache:
+    """Bounded LRU of decoded ID tokens, keyed by token hash"""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, max_ttl: float = TOKEN_CACHE_MAX_TTL):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, id_token: str) -> Optional[dict]:
+        key = token_key(id_token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        decoded, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return decoded
+
+    def set(self, id_token: str, decoded: dict):
+        # Never outlive the token itself
+        expires_at = min(decoded.get("exp", 0), time.time() + self.max_ttl)
+        if expires_at <= time.time():
+            return
+        key = token_key(id_token)
+        self._entries[key] = (decoded, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+def verify_id_token(id_token: str) -> dict:
+    """Verify an ID token with Firebase (blocking)"""
+    return firebase_auth.verify_id_token(id_token, check_revoked=AUTH_CHECK_REVOKED)
+
+def _signing_key_request() -> Optional[Tuple[Callable, str]]:
+    """The token verifier's own cached key download and the URL it fetches.
+
+    This reaches into firebase_admin internals (as of the 6.2.0 pinned in
+    requirements.txt), so it returns None on a version that lays them out
+    differently instead of failing somewhere less obvious.
+    """
+    try:
+        from firebase_admin import _token_gen
+        verifier = firebase_auth._get_client(None)._token_verifier
+        return verifier.request, _token_gen.ID_TOKEN_CERT_URI
+    except (ImportError, AttributeError):
+        return None
+
+def prefetch_signing_keys():
+    """Warm the HTTP cache holding Google's ID token signing keys.
+
+    verify_id_token downloads these keys whenever its cached copy has
+    expired, which would otherwise land on some user's request. Fetching
+    them through the verifier's own cached session keeps that copy fresh.
+    """
+    try:
+        key_request = _signing_key_request()
+        if key_request is None:
+            print("Prefetching token signing keys is unsupported by this firebase-admin version")
+            return
+        request, cert_url = key_request
+        request(url=cert_url)
+    except Exception as e:
+        print(f"Failed to prefetch token signing keys: {e}")
+
+token_cache = TokenCache()
@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from firebase_config import async_firebase_service
+from typing import Dict, Iterable, Optional, Tuple
+import os
+import time
+
+# User cache configuration
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+class UserCache:
+    """Short-lived TTL + LRU cache of user records keyed by uid.
+
+    Misses are loaded from the users collection in bulk, so a sweep that
+    alerts many users reads them in a handful of queries.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, uid: str) -> Optional[dict]:
+        entry = self._entries.get(uid)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[uid]
+            return None
+        self._entries.move_to_end(uid)
+        return user
+
+    def _store(self, uid: str, user: dict):
+        self._entries[uid] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(uid)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, uid: str) -> Optional[dict]:
+        return (await self.get_many([uid])).get(uid)
+
+    async def get_many(self, uids: Iterable[str]) -> Dict[str, dict]:
+        """Users by uid; uids with no user record are left out"""
+        users = {}
+        missing = []
+        for uid in dict.fromkeys(uids):
+            user = self._lookup(uid)
+            if user is None:
+                missing.append(uid)
+            else:
+                users[uid] = user
+        self.hits += len(users)
+        self.misses += len(missing)
+
+        if missing:
+            loaded = await async_firebase_service.get_documents_by("users", "uid", missing)
+            for uid, user in loaded.items():
+                self._store(uid, user)
+                users[uid] = user
+        return users
+
+    def invalidate(self, uid: str):
+        self._entries.pop(uid, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+user_cache = UserCache()